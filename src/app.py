@@ -1,7 +1,27 @@
+import os
+from pathlib import Path
+
 import dash
 from dash import Dash
 
 from lib.appshell import create_appshell
+from lib.data_api import add_data_api
+from lib.export import add_exports
+from lib.geo import add_local_topojson
+from lib.hot_reload import add_hot_reload
+from lib.http_cache import add_http_cache
+from util import disk_cache, snapshot
+
+DATASETS = Path(__file__).parents[1] / "Datasets"
+
+# Shared by every worker on the host; point it outside the checkout to keep
+# it warm across deploys. Opened before the pages build their figures.
+figure_cache = disk_cache.open_store(
+    os.environ.get(
+        "FIGURE_CACHE", Path(__file__).parents[1] / ".cache" / "figures.sqlite"
+    ),
+    max_bytes=int(os.environ.get("FIGURE_CACHE_MB", 512)) << 20,
+)
 
 app = Dash(
     __name__,
@@ -12,6 +32,23 @@ app = Dash(
 
 app.layout = create_appshell(dash.page_registry.values())
 server = app.server
+dataset_watcher = add_hot_reload(app)
+add_data_api(app)
+add_exports(app)
+add_local_topojson(app)
+callback_cache = add_http_cache(
+    app,
+    dependencies=snapshot.used_digests,
+    is_fresh=snapshot.is_current_digest,
+    store=figure_cache,
+    # Responses of callbacks reading files outside util.snapshot are only
+    # as fresh as the whole Datasets directory: the digests of the groups,
+    # already computed, and the mtime and size of the other files
+    version=disk_cache.make_key(
+        disk_cache.source_digest(*(p["module"] for p in dash.page_registry.values())),
+        snapshot.files_key(DATASETS),
+    ),
+)
 
 if __name__ == "__main__":
     app.run_server(host="0.0.0.0", debug=False)
@@ -0,0 +1,46 @@
+// Loads the figure of every lazy graph (see lib/lazy_graph.py) the first time
+// it comes close to the viewport, by clicking its hidden trigger button.
+(function () {
+  if (!("IntersectionObserver" in window)) {
+    return;
+  }
+
+  const observer = new IntersectionObserver(
+    function (entries) {
+      entries.forEach(function (entry) {
+        if (!entry.isIntersecting) {
+          return;
+        }
+        observer.unobserve(entry.target);
+        const trigger = entry.target.querySelector(".lazy-graph-trigger");
+        if (trigger) {
+          trigger.click();
+        }
+      });
+    },
+    { rootMargin: "200px 0px" }
+  );
+
+  function observeLazyGraphs() {
+    document
+      .querySelectorAll(".lazy-graph:not([data-lazy-observed])")
+      .forEach(function (element) {
+        element.setAttribute("data-lazy-observed", "true");
+        observer.observe(element);
+      });
+  }
+
+  function start() {
+    observeLazyGraphs();
+    new MutationObserver(observeLazyGraphs).observe(document.body, {
+      childList: true,
+      subtree: true,
+    });
+  }
+
+  if (document.readyState === "loading") {
+    document.addEventListener("DOMContentLoaded", start);
+  } else {
+    start();
+  }
+})();
@@ -0,0 +1,113 @@
+// Runs the app from a static snapshot built by tools/prerender.py: when the
+// page carries the dash-snapshot meta tag, the layout, the callback graph and
+// the callback responses are read from the prerendered files instead of the
+// server. A callback state that was not prerendered leaves its outputs as
+// they are.
+(function () {
+  const meta = document.querySelector('meta[name="dash-snapshot"]');
+  if (!meta || !window.fetch) {
+    return;
+  }
+
+  const root = meta.getAttribute("content").replace(/\/$/, "");
+  const serverFetch = window.fetch.bind(window);
+  const indexes = {};
+  const FILES = {
+    "_dash-layout": "layout.json",
+    "_dash-dependencies": "dependencies.json",
+  };
+
+  // Same key as state_key in tools/prerender.py: compact JSON, sorted keys
+  function stringify(value) {
+    if (Array.isArray(value)) {
+      return "[" + value.map(stringify).join(",") + "]";
+    }
+    if (value !== null && typeof value === "object") {
+      return (
+        "{" +
+        Object.keys(value)
+          .sort()
+          .filter(function (key) {
+            return value[key] !== undefined;
+          })
+          .map(function (key) {
+            return JSON.stringify(key) + ":" + stringify(value[key]);
+          })
+          .join(",") +
+        "}"
+      );
+    }
+    return value === undefined ? "null" : JSON.stringify(value);
+  }
+
+  function values(props) {
+    return (props || []).map(function (prop) {
+      return prop.value;
+    });
+  }
+
+  // Responses are stored gzipped; servers that do not send them with
+  // Content-Encoding leave the decompression to us
+  async function read(path) {
+    const response = await serverFetch(root + "/" + path);
+    if (!response.ok) {
+      return null;
+    }
+    const bytes = new Uint8Array(await response.arrayBuffer());
+    if (bytes[0] === 0x1f && bytes[1] === 0x8b) {
+      const stream = new Blob([bytes])
+        .stream()
+        .pipeThrough(new DecompressionStream("gzip"));
+      return new Response(stream).text();
+    }
+    return new TextDecoder().decode(bytes);
+  }
+
+  function index(path) {
+    if (!(path in indexes)) {
+      indexes[path] = read(path).then(function (text) {
+        return text ? JSON.parse(text) : {};
+      });
+    }
+    return indexes[path];
+  }
+
+  function respond(text) {
+    if (text === null) {
+      // Dash treats 204 as "no update"
+      return new Response(null, { status: 204 });
+    }
+    return new Response(text, {
+      status: 200,
+      headers: { "Content-Type": "application/json" },
+    });
+  }
+
+  async function update(body) {
+    const payload = JSON.parse(body);
+    const entry = (await index("index.json"))[payload.output];
+    if (!entry) {
+      return respond(null);
+    }
+    const key = [payload.output, values(payload.inputs), values(payload.state)];
+    if (entry.trigger) {
+      // The callback branches on what triggered it
+      key.push((payload.changedPropIds || []).slice().sort());
+    }
+    const directory = entry.directory;
+    const file = (await index(directory + "/index.json"))[stringify(key)];
+    return respond(file ? await read(directory + "/" + file) : null);
+  }
+
+  window.fetch = function (resource, options) {
+    const url = typeof resource === "string" ? resource : resource.url;
+    const name = new URL(url, window.location.href).pathname.split("/").pop();
+    if (name in FILES) {
+      return read(FILES[name]).then(respond);
+    }
+    if (name === "_dash-update-component") {
+      return update(options.body);
+    }
+    return serverFetch(resource, options);
+  };
+})();
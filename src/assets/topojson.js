@@ -0,0 +1,41 @@
+// Points plotly.js at the world topojson served from the app's assets (see
+// lib/geo.py) instead of the Plotly CDN, at the level of detail that fits
+// the viewport: the smallest level meant for screens at least this wide.
+(function () {
+  const meta = document.querySelector('meta[name="plotly-topojson"]');
+  if (!meta) {
+    return;
+  }
+
+  const config = JSON.parse(meta.getAttribute("content"));
+  const levels = Object.keys(config.levels);
+  const width = window.innerWidth;
+  const level =
+    levels.find(function (name) {
+      const maxWidth = config.levels[name];
+      return maxWidth === null || width <= maxWidth;
+    }) || levels[levels.length - 1];
+  const topojsonURL = config.url + level + "/";
+
+  function configure(plotly) {
+    plotly.setPlotConfig({ topojsonURL: topojsonURL });
+  }
+
+  if (window.Plotly) {
+    configure(window.Plotly);
+    return;
+  }
+  // dcc.Graph loads plotly.js with a script tag of its own when the first
+  // graph is rendered. Load events reach the document in the capture phase
+  // before the tag's onload, which is what lets the graph draw.
+  document.addEventListener(
+    "load",
+    function onLoad(event) {
+      if (event.target.tagName === "SCRIPT" && window.Plotly) {
+        configure(window.Plotly);
+        document.removeEventListener("load", onLoad, true);
+      }
+    },
+    true
+  );
+})();
@@ -0,0 +1,267 @@
+import base64
+import gzip
+import hashlib
+import json
+
+import numpy as np
+from flask import Blueprint, Response, jsonify, request
+
+from util import emissions, snapshot, temperature
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow responses are optional
+    pa = None
+
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+FIELDS = ("Entity", "Code", "Year", "Value")
+DEFAULT_LIMIT, MAX_LIMIT = 1000, 10000
+# Smaller bodies are not worth compressing
+GZIP_MIN_SIZE = 1024
+
+
+def _emissions_metric(metric):
+    def load():
+        entities, codes, years, _ = emissions.load_cube()
+        return entities, codes, years, emissions.values(metric)
+
+    return dict(
+        group="emissions",
+        label=emissions.label(metric),
+        load=load,
+        index=emissions.entity_index,
+    )
+
+
+def _temperature():
+    countries, years, values = temperature.annual_matrix()
+    return countries, None, years, values
+
+
+# Entity × year matrices served by the API: their snapshot group, a function
+# returning ``(entities, codes, years, values)`` and the entity → row lookup.
+METRICS = {
+    "annual": _emissions_metric("annual"),
+    "per_capita": _emissions_metric("per_capita"),
+    "share": _emissions_metric("share"),
+    "growth": _emissions_metric("growth"),
+    "cumulative": _emissions_metric("cumulative"),
+    "temperature": dict(
+        group="temperature",
+        label="Average land temperature (°C)",
+        load=_temperature,
+        index=temperature.country_index,
+    ),
+}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _int_arg(name, default=None):
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ApiError(400, f"{name} must be an integer")
+
+
+def _cursor(offset, version):
+    return base64.urlsafe_b64encode(f"{offset}:{version}".encode()).decode()
+
+
+def _parse_cursor(cursor, version):
+    try:
+        offset, cursor_version = base64.urlsafe_b64decode(cursor).decode().split(":")
+        offset = int(offset)
+    except ValueError:
+        raise ApiError(400, "Invalid cursor")
+    if offset < 0:
+        raise ApiError(400, "Invalid cursor")
+    if cursor_version != version:
+        raise ApiError(410, "The data changed since the first page, start over")
+    return offset
+
+
+def _etag(*parts):
+    return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()
+
+
+def _slice(spec, entities_arg, start, end):
+    """
+    Rows and year window of the request, looked up in the shared indexes.
+    Returns ``(entities, codes, years, values)`` restricted to them.
+    """
+    entities, codes, years, values = spec["load"]()
+    if entities_arg:
+        index = spec["index"]()
+        unknown = [entity for entity in entities_arg if entity not in index]
+        if unknown:
+            raise ApiError(404, f"Unknown entities: {', '.join(unknown)}")
+        rows = np.array([index[entity] for entity in entities_arg], dtype=int)
+    else:
+        rows = np.arange(len(entities))
+    window = slice(
+        np.searchsorted(years, years[0] if start is None else start),
+        np.searchsorted(years, years[-1] if end is None else end, side="right"),
+    )
+    codes = codes[rows] if codes is not None else None
+    return entities[rows], codes, years[window], values[rows, window]
+
+
+def _page(spec, fields, entities_arg, start, end, offset, limit):
+    # Long rows (entity-major, missing values skipped) from offset on
+    entities, codes, years, values = _slice(spec, entities_arg, start, end)
+    present = np.flatnonzero(~np.isnan(values))
+    cells = present[offset : offset + limit]
+    rows, columns = np.divmod(cells, len(years)) if len(years) else (cells, cells)
+
+    page = {}
+    if "Entity" in fields:
+        page["Entity"] = entities[rows].tolist()
+    if "Code" in fields and codes is not None:
+        page["Code"] = [c if isinstance(c, str) else None for c in codes[rows]]
+    if "Year" in fields:
+        page["Year"] = years[columns].tolist()
+    if "Value" in fields:
+        page["Value"] = values.ravel()[cells].tolist()
+    more = offset + limit < len(present)
+    return page, len(present), more
+
+
+def _arrow(page):
+    table = pa.table(page)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def formats():
+    return ["json", "arrow"] if pa is not None else ["json"]
+
+
+def _respond(body, mimetype, etag, headers):
+    gzipped = len(body) >= GZIP_MIN_SIZE and "gzip" in request.headers.get(
+        "Accept-Encoding", ""
+    )
+    if gzipped:
+        body = gzip.compress(body, compresslevel=6)
+        # Every encoding of the same data needs its own strong ETag
+        etag = f"{etag}-gzip"
+    response = Response(body, mimetype=mimetype, headers=headers)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept-Encoding")
+    if gzipped:
+        response.headers["Content-Encoding"] = "gzip"
+    return response
+
+
+def create_data_api(name="data_api"):
+    """
+    Read-only JSON / Arrow access to the entity × year matrices the pages
+    plot, straight from the in-memory datasets of ``util.snapshot``.
+
+    ``GET /`` lists the METRICS. ``GET /<metric>`` returns one page of
+    ``Entity``, ``Code``, ``Year`` and ``Value`` columns, without missing
+    values, filtered by:
+
+    - ``entity``: repeated for every entity wanted (default: all)
+    - ``start``, ``end``: the years, inclusive
+    - ``fields``: comma separated subset of the columns
+    - ``limit`` and ``cursor``: page size and the ``next_cursor`` of the
+      previous page
+    - ``format``: ``json`` (columnar) or ``arrow`` (IPC stream, needs
+      pyarrow; the cursor is then in the ``X-Next-Cursor`` header)
+
+    Responses carry an ETag derived from the dataset content and the query,
+    answer ``If-None-Match`` with 304 and are gzipped when accepted.
+    """
+    api = Blueprint(name, __name__)
+
+    @api.errorhandler(ApiError)
+    def api_error(error):
+        response = jsonify(error=str(error))
+        response.status_code = error.status
+        return response
+
+    @api.get("/")
+    def index():
+        metrics = {}
+        for metric, spec in METRICS.items():
+            entities, _, years, _ = spec["load"]()
+            metrics[metric] = dict(
+                label=spec["label"],
+                entities=len(entities),
+                start=int(years[0]),
+                end=int(years[-1]),
+            )
+        return jsonify(metrics=metrics, fields=FIELDS, formats=formats())
+
+    @api.get("/<metric>")
+    def metric_slice(metric):
+        if metric not in METRICS:
+            raise ApiError(404, f"Unknown metric: {metric}")
+        spec = METRICS[metric]
+        # The content digest, unlike the version counter, is the same in
+        # every worker and after a restart
+        version = snapshot.current().digests.get(spec["group"])
+
+        output = request.args.get("format", "json")
+        if output not in formats():
+            raise ApiError(406, f"Unsupported format: {output}")
+        fields = request.args.get("fields")
+        fields = fields.split(",") if fields else list(FIELDS)
+        unknown = [field for field in fields if field not in FIELDS]
+        if unknown:
+            raise ApiError(400, f"Unknown fields: {', '.join(unknown)}")
+        entities_arg = request.args.getlist("entity")
+        start, end = _int_arg("start"), _int_arg("end")
+        limit = min(max(_int_arg("limit", DEFAULT_LIMIT), 1), MAX_LIMIT)
+        cursor = request.args.get("cursor")
+        offset = _parse_cursor(cursor, version) if cursor else 0
+
+        # The same query on the same dataset version is the same page, so
+        # a revalidation is answered before slicing anything.
+        etag = _etag(
+            metric, version, output, fields, entities_arg, start, end, limit, offset
+        )
+        for tag in (etag, f"{etag}-gzip"):
+            if request.if_none_match.contains(tag):
+                response = Response(status=304)
+                response.set_etag(tag)
+                return response
+
+        page, total, more = _page(spec, fields, entities_arg, start, end, offset, limit)
+        next_cursor = _cursor(offset + limit, version) if more else None
+        if output == "arrow":
+            headers = {"X-Total-Count": str(total)}
+            if next_cursor:
+                headers["X-Next-Cursor"] = next_cursor
+            return _respond(_arrow(page), ARROW_MIMETYPE, etag, headers)
+
+        body = json.dumps(
+            dict(
+                metric=metric,
+                label=spec["label"],
+                version=version,
+                total=total,
+                next_cursor=next_cursor,
+                columns=page,
+            ),
+            separators=(",", ":"),
+        ).encode()
+        return _respond(body, "application/json", etag, {})
+
+    return api
+
+
+def add_data_api(app, url_prefix="/api/v1"):
+    """Register the data API of ``create_data_api`` on a Dash app's server."""
+    app.server.register_blueprint(create_data_api(), url_prefix=url_prefix)
@@ -0,0 +1,166 @@
+import io
+import json
+
+from dash import Input, Output, clientside_callback, html
+from flask import Blueprint, Response, abort, request, stream_with_context
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet exports are optional
+    pa = pq = None
+
+# Exports by name: ``rows``, called with the values of the controls of their
+# graph and yielding the rows it shows as DataFrame chunks, and the KINDS of
+# those values.
+EXPORTS = {}
+
+MIMETYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+# The values a control can send, by kind; None until it has one
+KINDS = {
+    "strings": lambda value: value is None
+    or (isinstance(value, list) and all(isinstance(item, str) for item in value)),
+    "number": lambda value: value is None
+    or (isinstance(value, (int, float)) and not isinstance(value, bool)),
+}
+
+
+def formats():
+    return ["csv", "parquet"] if pq is not None else ["csv"]
+
+
+def register_export(name, rows, kinds):
+    unknown = set(kinds) - set(KINDS)
+    if unknown:
+        raise ValueError(f"Unknown kinds {sorted(unknown)}, expected {list(KINDS)}")
+    EXPORTS[name] = dict(rows=rows, kinds=list(kinds))
+
+
+def valid_args(args, kinds):
+    """Whether ``args`` holds one value of each of ``kinds``, in order."""
+    return (
+        isinstance(args, list)
+        and len(args) == len(kinds)
+        and all(KINDS[kind](value) for kind, value in zip(kinds, args))
+    )
+
+
+def iter_rows(df, positions, columns, chunk_size=10000):
+    """The rows of ``df`` at ``positions``, ``chunk_size`` at a time."""
+    for start in range(0, len(positions), chunk_size):
+        yield df.iloc[positions[start : start + chunk_size]][columns]
+
+
+def _csv(chunks):
+    header = True
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=header)
+        header = False
+
+
+class _Pipe(io.RawIOBase):
+    # Collects what the Parquet writer writes until it is drained
+    def __init__(self):
+        self.parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def _parquet(chunks):
+    pipe = _Pipe()
+    writer = None
+    for chunk in chunks:
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(pipe, table.schema)
+        # Every chunk becomes a row group, sent as soon as it is written
+        writer.write_table(table)
+        yield pipe.drain()
+    if writer is not None:
+        writer.close()
+        yield pipe.drain()
+
+
+def create_export_blueprint(name="export"):
+    """
+    ``GET /<export>.<format>?args=<JSON list>`` streams the rows of one of the
+    EXPORTS for the given control values, one chunk at a time. Values that
+    the export's controls cannot send are a 400.
+    """
+    blueprint = Blueprint(name, __name__)
+
+    @blueprint.get("/<export>.<output>")
+    def download(export, output):
+        if export not in EXPORTS or output not in formats():
+            abort(404)
+        spec = EXPORTS[export]
+        try:
+            args = json.loads(request.args.get("args", "[]"))
+        except ValueError:
+            abort(400)
+        if not valid_args(args, spec["kinds"]):
+            abort(400)
+        stream = _csv if output == "csv" else _parquet
+        chunks = spec["rows"](*args)
+        return Response(
+            stream_with_context(stream(chunks)),
+            mimetype=MIMETYPES[output],
+            headers={
+                "Content-Disposition": f'attachment; filename="{export}.{output}"'
+            },
+        )
+
+    return blueprint
+
+
+def add_exports(app, url_prefix="/export"):
+    app.server.register_blueprint(create_export_blueprint(), url_prefix=url_prefix)
+
+
+def create_export_links(id, name, inputs, rows, kinds, url_prefix="/export"):
+    """
+    Download links for the data of a graph, one per format.
+
+    ``rows`` is called with the values of the ``inputs`` components, given as
+    ``(component_id, property)`` pairs like the graph's own callback, and
+    yields the rows as DataFrame chunks; ``kinds`` names the KINDS of those
+    values, anything else is rejected. The links are kept up to date in the
+    browser, and the download itself is streamed by the export route, so the
+    data never goes through a callback.
+    """
+    if len(kinds) != len(inputs):
+        raise ValueError(f"{name}: {len(inputs)} inputs but {len(kinds)} kinds")
+    register_export(name, rows, kinds)
+    link_ids = [f"{id}-{output}" for output in formats()]
+
+    clientside_callback(
+        f"""
+        function(...values) {{
+            const args = encodeURIComponent(JSON.stringify(values));
+            return {json.dumps(formats())}.map(
+                output => `{url_prefix}/{name}.${{output}}?args=${{args}}`
+            );
+        }}
+        """,
+        [Output(link_id, "href") for link_id in link_ids],
+        [Input(component_id, prop) for component_id, prop in inputs],
+    )
+
+    return html.Div(
+        [
+            html.A(f"Download {output.upper()}", id=link_id, href="", download="")
+            for output, link_id in zip(formats(), link_ids)
+        ],
+        className="export-links",
+        style={"display": "flex", "gap": "1rem", "justifyContent": "flex-end"},
+    )
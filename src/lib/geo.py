@@ -0,0 +1,57 @@
+import json
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+TOPOJSON = Path(__file__).parents[1] / "assets" / "topojson"
+# The file plotly.js asks for: every figure keeps the default
+# ``geo.resolution`` and the level of detail is picked by the directory.
+TOPOJSON_NAME = "world_110m.json"
+
+# Levels of detail of the world geometry: the Plotly topojson each one is
+# built from by ``tools/topojson.py``, the Douglas-Peucker tolerance (in
+# degrees) it is simplified with and the widest viewport (in CSS pixels) it
+# is used for.
+LEVELS = {
+    "low": dict(source="world_110m", tolerance=0.3, max_width=800),
+    "medium": dict(source="world_110m", tolerance=0, max_width=1600),
+    "high": dict(source="world_50m", tolerance=0, max_width=None),
+}
+
+
+def available_levels():
+    return [level for level in LEVELS if (TOPOJSON / level / TOPOJSON_NAME).exists()]
+
+
+def add_local_topojson(app):
+    """
+    Make every map load its country geometry from the app's assets instead
+    of the Plotly CDN, at the level of detail that fits the viewport.
+
+    The levels built by ``tools/topojson.py`` (at image build time, see the
+    Dockerfile) are announced in a meta tag read by ``assets/topojson.js``,
+    which sets plotly.js' ``topojsonURL`` as soon as plotly.js has loaded,
+    before the first plot. Without them the maps keep using the CDN.
+    """
+    levels = available_levels()
+    if not levels:
+        logger.warning(
+            "No topojson in %s, maps load it from the Plotly CDN; "
+            "build it with src/tools/topojson.py",
+            TOPOJSON,
+        )
+        return levels
+
+    app.config.meta_tags.append(
+        dict(
+            name="plotly-topojson",
+            content=json.dumps(
+                dict(
+                    url=app.get_asset_url("topojson/"),
+                    levels={level: LEVELS[level]["max_width"] for level in levels},
+                )
+            ),
+        )
+    )
+    return levels
@@ -0,0 +1,23 @@
+from util import snapshot
+
+
+def add_hot_reload(app, interval=10.0):
+    """
+    Reload the datasets of ``util.snapshot`` in the background when their
+    files change, without restarting the app.
+
+    Every request is pinned to the snapshot current when it started, so it
+    finishes on the data it began with even if a reload is swapped in
+    meanwhile. Returns an event that stops the watcher when set.
+    """
+    server = app.server
+
+    @server.before_request
+    def pin_snapshot():
+        snapshot.pin()
+
+    @server.teardown_request
+    def release_snapshot(exception):
+        snapshot.release()
+
+    return snapshot.watch(interval)
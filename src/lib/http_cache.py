@@ -0,0 +1,157 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from flask import Response, g, request
+
+# Endpoints whose GET responses only change when the app is redeployed.
+STATIC_ENDPOINTS = ("_dash-layout", "_dash-dependencies")
+
+
+class CallbackResponseCache:
+    """LRU cache of serialized callback responses keyed by request body hash."""
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _etag(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _dumps(entry):
+    # The status, mimetype and dependencies as a JSON line, then the body
+    data, status, mimetype, used = entry
+    return json.dumps([status, mimetype, used]).encode() + b"\n" + data
+
+
+def _loads(saved):
+    header, data = saved.split(b"\n", 1)
+    status, mimetype, used = json.loads(header)
+    if not (
+        isinstance(status, int)
+        and isinstance(mimetype, str)
+        and (used is None or isinstance(used, dict))
+    ):
+        raise ValueError("Malformed callback entry")
+    return data, status, mimetype, used
+
+
+def add_http_cache(
+    app,
+    max_entries=2048,
+    uncacheable_outputs=(),
+    dependencies=None,
+    is_fresh=None,
+    store=None,
+    version="",
+):
+    """
+    Add strong ETags with 304 handling to the layout, dependencies and page
+    HTML responses of a Dash app, and answer repeated callback requests from
+    a cache keyed by the hash of their body.
+
+    Callbacks listed in ``uncacheable_outputs`` (matched against the
+    ``output`` field of the request) are always recomputed.
+
+    When the data behind the callbacks can change while the app runs, pass
+    ``dependencies``, called after a callback to describe the data it used,
+    and ``is_fresh``, called with that description before a cached response
+    is served again (see ``util.snapshot``).
+
+    With a ``store`` (see ``util.disk_cache``) responses missing in memory
+    are also looked up there and every computed response is saved to it,
+    so workers share them and a restart starts warm. ``version`` should
+    change with the callbacks' code, and ``dependencies`` then has to
+    describe the data in a way that holds in every process.
+    """
+    server = app.server
+    prefix = app.config.routes_pathname_prefix
+    update_path = f"{prefix}_dash-update-component"
+    static_paths = {f"{prefix}{endpoint}" for endpoint in STATIC_ENDPOINTS}
+    callbacks = CallbackResponseCache(max_entries)
+
+    def is_cacheable_callback():
+        if request.method != "POST" or request.path != update_path:
+            return False
+        output = (request.get_json(silent=True) or {}).get("output", "")
+        return not any(o in output for o in uncacheable_outputs)
+
+    @server.before_request
+    def serve_cached_callback():
+        if not is_cacheable_callback():
+            return None
+        g.callback_cache_key = _etag(request.get_data())
+        entry = callbacks.get(g.callback_cache_key)
+        if entry is None and store is not None:
+            saved = store.get(f"callback:{version}:{g.callback_cache_key}")
+            try:
+                entry = _loads(saved) if saved is not None else None
+            except (ValueError, TypeError):
+                entry = None
+            if entry is not None:
+                callbacks.put(g.callback_cache_key, entry)
+        if entry is None:
+            return None
+        data, status, mimetype, used = entry
+        if is_fresh is not None and not is_fresh(used):
+            return None
+        g.callback_cache_hit = True
+        response = Response(data, status=status, mimetype=mimetype)
+        response.set_etag(_etag(f"{g.callback_cache_key}{used}".encode()))
+        return response
+
+    @server.after_request
+    def add_etag(response):
+        if response.direct_passthrough or response.status_code not in (200, 204):
+            return response
+
+        key = g.pop("callback_cache_key", None)
+        if key is not None:
+            if not g.pop("callback_cache_hit", False):
+                used = dependencies() if dependencies is not None else None
+                entry = (
+                    response.get_data(),
+                    response.status_code,
+                    response.mimetype,
+                    used,
+                )
+                callbacks.put(key, entry)
+                if store is not None:
+                    store.put(f"callback:{version}:{key}", _dumps(entry))
+                response.set_etag(_etag(f"{key}{used}".encode()))
+            return response
+
+        if request.method != "GET" or response.get_etag()[0] is not None:
+            return response
+        if request.path in static_paths or response.mimetype == "text/html":
+            response.set_etag(_etag(response.get_data()))
+            response.headers.setdefault("Cache-Control", "no-cache")
+            response.make_conditional(request)
+        return response
+
+    return callbacks
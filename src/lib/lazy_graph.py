@@ -0,0 +1,66 @@
+from dash import Input, Output, State, callback, dcc, html
+
+
+def placeholder_figure(height=450):
+    return {
+        "data": [],
+        "layout": {
+            "height": height,
+            "xaxis": {"visible": False},
+            "yaxis": {"visible": False},
+            "annotations": [
+                {"text": "Loading…", "showarrow": False, "font": {"size": 16}}
+            ],
+        },
+    }
+
+
+def register_lazy_graph(id, builder, state=()):
+    """
+    Register the callback that fills the lazy graph ``id`` with ``builder``.
+
+    Callbacks can only be registered at import: pages whose layout is a
+    function call this at module level, then ``create_lazy_graph(id)``
+    without a builder in the layout.
+    """
+
+    @callback(
+        Output(id, "figure", allow_duplicate=True),
+        Input(_trigger_id(id), "n_clicks"),
+        *[State(component_id, prop) for component_id, prop in state],
+        prevent_initial_call=True,
+    )
+    def load_figure(n_clicks, *values):
+        return builder(*values)
+
+
+def _trigger_id(id):
+    return f"{id}-lazy-trigger"
+
+
+def create_lazy_graph(id, builder=None, state=(), height=450, **graph_kwargs):
+    """
+    A dcc.Graph that ships with an empty placeholder and only asks the server
+    for its figure once it is scrolled into view.
+
+    ``assets/lazy_graph.js`` clicks the hidden trigger button when the
+    wrapper enters the viewport; the callback registered here then calls
+    ``builder`` with the current values of the ``state`` components, given as
+    ``(component_id, property)`` pairs. Without a builder, the callback is
+    the one of ``register_lazy_graph``.
+    """
+    if builder is not None:
+        register_lazy_graph(id, builder, state)
+
+    return html.Div(
+        [
+            dcc.Graph(id=id, figure=placeholder_figure(height), **graph_kwargs),
+            html.Button(
+                id=_trigger_id(id),
+                n_clicks=0,
+                className="lazy-graph-trigger",
+                style={"display": "none"},
+            ),
+        ],
+        className="lazy-graph",
+    )
@@ -7,6 +7,22 @@ from assets.constants import months
 from pathlib import Path
 import plotly.express as px
 
+from util.emissions import (
+    DERIVED,
+    METRICS,
+    label,
+    load_cube,
+    select,
+    select_chunks,
+    select_frame,
+    top_k,
+    top_k_range,
+    year_range,
+)
+from util.trends import linear_trends
+from util.snapshot import cached
+from lib.export import create_export_links
+
 register_page(
     __name__,
     "/annual_co2_emission",
@@ -26,100 +42,242 @@ df_dash = pd.read_csv(df_path)
 # Drop rows with missing values in the 'Entity' column
 df_dash = df_dash.dropna(axis=0, subset=["Entity"])
 
-# Create a figure for the bar chart of top 5 CO2-emitting countries in 2016
-CO2_df2020 = df_dash.loc[df_dash["Year"] == 2016]
-top5 = CO2_df2020.sort_values(by=["Annual CO₂ emissions"], ascending=False).head(5)
-bar_fig = px.bar(
-    top5.sort_values(by=["Annual CO₂ emissions"]),
-    x="Entity",
-    y="Annual CO₂ emissions",
-    labels={"value": "CO2 emissions (kt)"},
-    title="CO2 emissions (kt) - Top 5 nations in Year 2016",
-)
-bar_fig.update_xaxes(fixedrange=True)
-
 # Load flat dataframe for dropdown options
 df_flat = pd.read_csv(df_path)
 available_countries = df_flat["Entity"].unique()
 # Define the slider
 
-# Define the layout of the dashboard
-layout = html.Div(
-    children=[
-        html.H1(children="Annual CO2 Emission", style={"textAlign": "center"}),
-        html.P(
-            children="Who emits the most CO2 each year? In the following visualization, we show annual CO2 emissions aggregated by countries and region, with a special focus on the leading emitters including India, China, and the United States.",
-            style={"textAlign": "left"},
-        ),
-        html.P(
-            "We can explore how CO2 emissions change by country and over time in the following interactive map. By selecting any country from the dropdown list, you can see how its annual emissions have changed, and compare it with other countries."
-        ),
+# The export links register their callbacks, so they are created once
+selection_export = create_export_links(
+    "co2-selection-export",
+    "annual_co2_selection",
+    [("country-selector", "value")],
+    lambda countries: select_chunks(countries or []),
+    ["strings"],
+)
+region_export = create_export_links(
+    "region-graph-export",
+    "annual_co2_regions",
+    [("region-dropdown", "value")],
+    lambda regions: select_chunks(regions or []),
+    ["strings"],
+)
+
+
+# Define the layout of the dashboard, per request so the years follow the
+# emissions cube after a reload
+def layout(**query):
+    min_year, max_year = year_range()
+    page = html.Div(
+        children=[
+            html.H1(children="Annual CO2 Emission", style={"textAlign": "center"}),
+            html.P(
+                children="Who emits the most CO2 each year? In the following visualization, we show annual CO2 emissions aggregated by countries and region, with a special focus on the leading emitters including India, China, and the United States.",
+                style={"textAlign": "left"},
+            ),
+            html.P(
+                "We can explore how CO2 emissions change by country and over time in the following interactive map. By selecting any country from the dropdown list, you can see how its annual emissions have changed, and compare it with other countries."
+            ),
+            html.Div(
+                html.H2(children="""Select Countries for comparative analysis""",
+                style={"textAlign": "center"}),
+            ),
+            dmc.Space(h="xl"),
+            dmc.Grid(
+                [
+                    dmc.Col(
+                        [
+                            dmc.Text("Select Plot Type:"),
+                        ],
+                        span=3,
+                    ),
+                    dmc.Col(
+                        [
+                            dmc.RadioGroup(
+                                id="view-selector",
+                                children=dmc.Group([dmc.Radio("Map View","Map View"),
+                                dmc.Radio("Chart View","Chart View")]),
+                                value="Map View",  
+                            ),
+                        ],
+                        span=9,
+                    ),
+                    dmc.Col(
+                        [
+                            dmc.Text("Select Countries:"),
+                        ],
+                        span=3,
+                    ),
+                    dmc.Col(
+                        [
+                            dmc.MultiSelect(
+                                id="country-selector",
+                                data=[
+                                    {"label": i, "value": i}
+                                    for i in available_countries
+                                ],
+                                value=[
+                                    "China",
+                                    "United States",
+                                    "India",
+                                    "United Kingdom",
+                                    "Canada",
+                                    "European Union (27)",
+                                ],
+                            ),
+                        ],
+                        span=9,
+                    ),
+                ],
+            ),
+            dmc.Space(h="xl"),
+            html.Div(
+                id="view-container",
+                style={
+                    "border": "1px solid #ddd",  # Use a more subtle border style
+                    "width": "90%",
+                    "height": "500px",
+                    "margin": "auto",
+                    "fontFamily": "Arial",  # Use a professional font
+                    "padding": "5px",  # Add padding
+                },
+            ),
+            selection_export,
+            dmc.Space(h="xl"),
+            html.H2(children="Top emitters by year", style={"textAlign": "center"}),
+            dmc.Grid(
+                [
+                    dmc.Col(
+                        dmc.Select(
+                            id="top-k-metric",
+                            label="Metric",
+                            data=[
+                                {"label": label(metric), "value": metric}
+                                for metric in [*METRICS, *DERIVED]
+                            ],
+                            value="annual",
+                        ),
+                        span=4,
+                    ),
+                    dmc.Col(
+                        dmc.NumberInput(
+                            id="top-k-count",
+                            label="Number of countries",
+                            min=1,
+                            max=50,
+                            value=5,
+                        ),
+                        span=2,
+                    ),
+                    dmc.Col(
+                        [
+                            dmc.Text("Year", size="sm"),
+                            dcc.Slider(
+                                id="top-k-year",
+                                min=min_year,
+                                max=max_year,
+                                step=1,
+                                value=max_year,
+                                marks={
+                                    year: str(year)
+                                    for year in range(min_year, max_year + 1, 50)
+                                },
+                                tooltip={"placement": "top"},
+                            ),
+                        ],
+                        span=6,
+                    ),
+                ],
+            ),
+            dcc.Graph(id="top-k-graph"),
+        ]
+    )
+    page.children.append(
         html.Div(
-            html.H2(children="""Select Countries for comparative analysis""",
-            style={"textAlign": "center"}),
-        ),
-        dmc.Space(h="xl"),
-        dmc.Grid(
             [
-                dmc.Col(
-                    [
-                        dmc.Text("Select Plot Type:"),
-                    ],
-                    span=3,
+                html.P(
+                    "Asia is by far the largest emitter, accounting for around half of global emissions. As it is home to almost 60% of the world’s population this means that per capita emissions in Asia are slightly lower than the world average, however."
                 ),
-                dmc.Col(
-                    [
-                        dmc.RadioGroup(
-                            id="view-selector",
-                            children=dmc.Group([dmc.Radio("Map View","Map View"),
-                            dmc.Radio("Chart View","Chart View")]),
-                            value="Map View",  
-                        ),
-                    ],
-                    span=9,
+                html.P(
+                    "China is, by a significant margin, Asia's and the world's largest emitter: it emits more than one-quarter of global emissions."
                 ),
-                dmc.Col(
-                    [
-                        dmc.Text("Select Countries:"),
-                    ],
-                    span=3,
+                html.P(
+                    "North America, dominated by the USA, is the second largest regional emitter at one-fourth of global emissions and it’s followed closely by Europe. Here we have grouped the countries in the European Union since they typically negotiate and set targets as a collective body. You can see the data for individual EU countries in the interactive maps that follow."
                 ),
-                dmc.Col(
-                    [
-                        dmc.MultiSelect(
-                            id="country-selector",
-                            data=[
-                                {"label": i, "value": i}
-                                for i in available_countries
-                            ],
-                            value=[
-                                "China",
-                                "United States",
-                                "India",
-                                "United Kingdom",
-                                "Canada",
-                                "European Union (27)",
-                            ],
-                        ),
-                    ],
-                    span=9,
+                html.P(
+                    "Africa and South America are both fairly small emitters: accounting for 3-4% of global emissions each. Both have emissions similar in size to international aviation and shipping combined."
                 ),
-            ],
-        ),
-        dmc.Space(h="xl"),
+            ]
+        )
+    )
+    page.children.append(
+        html.P(
+            children="Now, let's delve into the analysis of Total CO₂ Emissions between the years 2000 and 2022, focusing on the Top 20 Countries. Move the slider to total any other range of years."
+        )
+    )
+    page.children.append(
+        dcc.RangeSlider(
+            id="top-20-range",
+            min=min_year,
+            max=max_year,
+            step=1,
+            value=[2000, 2022],
+            marks={year: str(year) for year in range(min_year, max_year + 1, 25)},
+            tooltip={"placement": "top"},
+        )
+    )
+    # Add the graph to the layout
+    page.children.append(
+        dcc.Graph(
+            id="bar-graph",
+            figure=create_top_20_plot(),
+            style={"height": "600px", "width": "1000px"},
+        )
+    )
+    page.children.append(
+        html.P(children="Now observe the CO2 emission of different regions.")
+    )
+    # Every entity of the emissions cube, countries as well as regions
+    regions = load_cube()[0]
+    page.children.append(
         html.Div(
-            id="view-container",
-            style={
-                "border": "1px solid #ddd",  # Use a more subtle border style
-                "width": "90%",
-                "height": "500px",
-                "margin": "auto",
-                "fontFamily": "Arial",  # Use a professional font
-                "padding": "5px",  # Add padding
-            },
-        ),
-    ]
+            [
+                dcc.Dropdown(
+                    id="region-dropdown",
+                    options=[{"label": i, "value": i} for i in regions],
+                    value=["United States", "Europe", "Asia", "Africa", "Oceania"],
+                    multi=True,
+                ),
+                dcc.Graph(id="region-graph"),
+                region_export,
+            ]
+        )
+    )
+    page.children.append(
+        html.P(
+            children="From the above graph, we can observe although Europe and United States are the regions having most of the CO2 emission in total, Asia's CO2 emission has skyrocketed in the last 2 decades."
+        )
+    )
+    return page
+
+
+@callback(
+    Output("top-k-graph", "figure"),
+    Input("top-k-metric", "value"),
+    Input("top-k-year", "value"),
+    Input("top-k-count", "value"),
 )
+def update_top_k(metric, year, k):
+    # Slices of the precomputed rank table, nothing is sorted per request
+    names, top = top_k(metric, year, int(k or 5))
+    fig = px.bar(
+        x=names[::-1],
+        y=top[::-1],
+        labels={"x": "Country", "y": label(metric)},
+        title=f"{label(metric)} - Top {len(names)} nations in Year {year}",
+    )
+    fig.update_xaxes(fixedrange=True)
+    return fig
 
 
 @callback(
@@ -148,23 +306,39 @@ def update_view(selected_view, selected_countries):
 # Define callback function to update the graph based on dropdown selection
 @callback(Output("co2-time-series", "figure"), Input("country-selector", "value"))
 def update_graph(selected_countries):
-    # Filter dataframe based on selected countries
-    filtered_df = df_dash[df_dash["Entity"].isin(selected_countries)]
+    # Rows of the selected countries in the emissions cube, as exported
+    years, selected = select(selected_countries, "annual")
 
     # Plot multiple time series
     fig = go.Figure()
 
-    for country in selected_countries:
-        country_data = filtered_df[filtered_df["Entity"] == country]
+    for country, values in zip(selected_countries, selected):
+        present = ~np.isnan(values)
         fig.add_trace(
             go.Scatter(
-                x=country_data["Year"],
-                y=country_data["Annual CO₂ emissions"],
+                x=years[present],
+                y=values[present],
                 mode="lines",
                 name=country,
             )
         )
 
+    # Linear trend of every selected country since 2000, from the batched fits
+    trend_years = np.array([2000, year_range()[1]])
+    trends = linear_trends("annual", 2000).set_index("Entity")
+    for country in selected_countries:
+        if country in trends.index:
+            slope, intercept = trends.loc[country, ["Slope", "Intercept"]]
+            fig.add_trace(
+                go.Scatter(
+                    x=trend_years,
+                    y=intercept + slope * trend_years,
+                    mode="lines",
+                    line=dict(dash="dash"),
+                    name=f"{country} trend since 2000",
+                )
+            )
+
     fig.update_layout(
         title="CO2 Emissions Over Time",
         xaxis_title="Year",
@@ -239,141 +413,59 @@ def update_choropleth(selected_countries=None):
     return fig
 
 
-import pycountry
-
-layout.children.append(
-    html.Div(
-        [
-            html.P(
-                "Asia is by far the largest emitter, accounting for around half of global emissions. As it is home to almost 60% of the world’s population this means that per capita emissions in Asia are slightly lower than the world average, however."
-            ),
-            html.P(
-                "China is, by a significant margin, Asia's and the world's largest emitter: it emits more than one-quarter of global emissions."
-            ),
-            html.P(
-                "North America, dominated by the USA, is the second largest regional emitter at one-fourth of global emissions and it’s followed closely by Europe. Here we have grouped the countries in the European Union since they typically negotiate and set targets as a collective body. You can see the data for individual EU countries in the interactive maps that follow."
-            ),
-            html.P(
-                "Africa and South America are both fairly small emitters: accounting for 3-4% of global emissions each. Both have emissions similar in size to international aviation and shipping combined."
-            ),
-        ]
+@cached("emissions", maxsize=32, persist=True)
+def create_top_20_plot(start=2000, end=2022):
+    # Totals over the range come from the prefix sums of the emissions cube
+    names, totals = top_k_range("annual", start, end, 20)
+
+    # Create a DataFrame with the top 20 countries and their total emissions
+    top_20_df = pd.DataFrame({"Country": names, "Total Emissions": totals})
+
+    # Create a bar plot with a different color scale
+    fig = px.bar(
+        top_20_df,
+        x="Country",
+        y="Total Emissions",
+        color="Total Emissions",
+        hover_name="Country",
+        hover_data=["Total Emissions"],
+        color_continuous_scale="tealgrn",  # Change the color scale here
+        labels={
+            "Country": "Country",
+            "Total Emissions": "Total CO₂ Emission (in tonnes)",
+        },
+        height=500,
     )
-)
-
-
-# Get a list of all country names
-country_names = [country.name for country in pycountry.countries]
-
-# Filter the DataFrame to only include rows where 'Entity' is a valid country name
-df = df_flat[df_flat["Entity"].isin(country_names)]
-# Assuming 'df' is your DataFrame containing the data
-
-# Filter the data for the years 2000 to 2022
-filtered_data = df[(df["Year"] >= 2000) & (df["Year"] <= 2022)]
-
-
-# Calculate total emissions for each country
-total_emissions = filtered_data.groupby("Entity")["Annual CO₂ emissions"].sum()
-
-# # Sort the DataFrame by total emissions and select the top 20 countries
-total_emissions_sorted = total_emissions.sort_values(ascending=False).iloc[:20]
-
-# Create a DataFrame with the top 20 countries and their total emissions
-top_20_df = pd.DataFrame(
-    {
-        "Country": total_emissions_sorted.index,
-        "Total Emissions": total_emissions_sorted.values,
-    }
-)
-
-# Create a bar plot
-# Create a bar plot with a different color scale
-fig = px.bar(
-    top_20_df,
-    x="Country",
-    y="Total Emissions",
-    color="Total Emissions",
-    hover_name="Country",
-    hover_data=["Total Emissions"],
-    color_continuous_scale="tealgrn",  # Change the color scale here
-    labels={"Country": "Country", "Total Emissions": "Total CO₂ Emission (in tonnes)"},
-    height=500,
-)
-
-# Add text before the graph
-# Add text before the graph
-
-layout.children.append(
-    html.P(
-        children="Now, let's delve into the analysis of Total CO₂ Emissions between the years 2000 and 2022, focusing on the Top 20 Countries."
+    fig.update_layout(
+        uniformtext_minsize=15,
+        xaxis_tickangle=-45,
+        title=f"Total CO₂ Emission Between Years {start} and {end} - Top 20 Countries",
+        title_x=0.5,
+        font=dict(color="blue"),  # Change the text color here
     )
-)
-fig.update_layout(
-    uniformtext_minsize=15,
-    xaxis_tickangle=-45,
-    title="Total CO₂ Emission Between Years 2000 and 2022 - Top 20 Countries",
-    title_x=0.5,
-    font=dict(color="blue"),  # Change the text color here
-)
-
 
+    # Hide color scale axis
+    fig.update(layout_coloraxis_showscale=False)
+    return fig
 
-# Hide color scale axis
-fig.update(layout_coloraxis_showscale=False)
 
-# Add the graph to the layout
-layout.children.append(
-    dcc.Graph(id="bar-graph", figure=fig, style={"height": "600px", "width": "1000px"})
+@callback(
+    Output("bar-graph", "figure"),
+    Input("top-20-range", "value"),
+    prevent_initial_call=True,
 )
+def update_top_20_plot(window):
+    return create_top_20_plot(*window)
 
-layout.children.append(
-    html.P(children="Now observe the CO2 emission of different regions.")
-)
 
 ######
 
 
-df_path_region = (
-    Path(__file__).parents[2]
-    / "Datasets"
-    / "annual_co2_emissions_by_country"
-    / "annual-co-emissions-by-region.csv"
-)
-
-df_dash_region = pd.read_csv(df_path_region)
-# Get a list of all unique regions
-regions = df_dash_region["Entity"].unique()
-layout.children.append(
-    html.Div(
-        [
-            dcc.Dropdown(
-                id="region-dropdown",
-                options=[{"label": i, "value": i} for i in regions],
-                value=["United States", "Europe", "Asia", "Africa", "Oceania"],
-                multi=True,
-            ),
-            dcc.Graph(id="region-graph"),
-        ]
-    )
-)
-
-# Group the data frame by Entity and Year columns and sum the CO2 emission
-total_reg = df_dash_region.groupby(["Entity", "Year"])[
-    "Annual CO₂ emissions by region"
-].sum()
-
-# Create a data frame from the resulting series
-df_reg = pd.DataFrame(total_reg)
-
-# Resulting data frame will have 2 index columns: Entity and Year
-# We should reset the index to convert them into columns
-df_reg.reset_index(level=0, inplace=True)
-df_reg.reset_index(level=0, inplace=True)
-
-
 @callback(Output("region-graph", "figure"), [Input("region-dropdown", "value")])
 def update_graph(selected_regions):
-    df_selected = df_reg[df_reg["Entity"].isin(selected_regions)]
+    df_selected = select_frame(selected_regions).rename(
+        columns={"Annual CO₂ emissions": "Annual CO₂ emissions by region"}
+    )
 
     fig = px.area(
         df_selected,
@@ -391,10 +483,3 @@ def update_graph(selected_regions):
     )
 
     return fig
-
-
-layout.children.append(
-    html.P(
-        children="From the above graph, we can observe although Europe and United States are the regions having most of the CO2 emission in total, Asia's CO2 emission has skyrocketed in the last 2 decades."
-    )
-)
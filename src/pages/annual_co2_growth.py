@@ -1,21 +1,12 @@
-import numpy as np
-import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 from dash import dcc, html, register_page, Input, Output, callback
 import dash_mantine_components as dmc
 
-# Load data
-df = pd.read_csv('Datasets/Annual_perc_change in co2/change-co2-annual-pct.csv')
+from util.emissions import growth_frame
 
-# Calculate total emissions for each country
-total_emissions = df.groupby('Entity')['Annual CO₂ emissions growth (%)'].sum()
-
-# Get the top 10 countries
-top_countries = df["Entity"].tolist()
-
-# Filter the data for the top 10 countries
-df_top_countries = df[df['Entity'].isin(top_countries[:])]
+# Year-on-year growth derived from the annual emissions
+df = growth_frame()
 
 # Register the page
 register_page(
@@ -61,7 +52,7 @@ layout = html.Div([
                         dmc.MultiSelect(
                             id="country-dropdown-growth",
                             data=[
-                                {'label': i, 'value': i} for i in df_top_countries['Entity'].unique()
+                                {'label': i, 'value': i} for i in df['Entity'].unique()
                             ],
                             value=[
                                 "World",
@@ -93,6 +84,46 @@ layout = html.Div([
                     ],
                     span=9,
                 ),
+                dmc.Col(
+                    [
+                        dmc.Text("Select Growth Period:"),
+                    ],
+                    span=3,
+                ),
+                dmc.Col(
+                    [
+                        dmc.SegmentedControl(
+                            id='growth-window',
+                            data=[
+                                {'label': 'Year-on-year', 'value': '1'},
+                                {'label': '5-year CAGR', 'value': '5'},
+                                {'label': '10-year CAGR', 'value': '10'},
+                            ],
+                            value='1',
+                        ),
+                    ],
+                    span=9,
+                ),
+                dmc.Col(
+                    [
+                        dmc.Text("Select Smoothing:"),
+                    ],
+                    span=3,
+                ),
+                dmc.Col(
+                    [
+                        dmc.SegmentedControl(
+                            id='growth-smoothing',
+                            data=[
+                                {'label': 'None', 'value': '1'},
+                                {'label': '3-year mean', 'value': '3'},
+                                {'label': '5-year mean', 'value': '5'},
+                            ],
+                            value='1',
+                        ),
+                    ],
+                    span=9,
+                ),
                 dmc.Col(
                     [
                         dmc.Text("Select CO₂ emissions growth range (%):"),
@@ -153,10 +184,15 @@ def update_slider_disabled(plot_type):
     [Input('plot-type-dropdown', 'value'),
      Input('country-dropdown-growth', 'value'),
      Input('year-slider-growth', 'value'),
-     Input('growth-range-slider', 'value')]  # Add the range slider as an input
+     Input('growth-range-slider', 'value'),  # Add the range slider as an input
+     Input('growth-window', 'value'),
+     Input('growth-smoothing', 'value')]
 )
 
-def update_plot(plot_type, selected_countries, selected_year, growth_range):
+def update_plot(plot_type, selected_countries, selected_year, growth_range, window='1', smoothing='1'):
+    # Growth over the chosen period, cached per window and smoothing
+    df = growth_frame(int(window), int(smoothing))
+
     # Ensure selected_countries is a list
     if not isinstance(selected_countries, list):
         selected_countries = [selected_countries]
@@ -165,7 +201,7 @@ def update_plot(plot_type, selected_countries, selected_year, growth_range):
         fig = go.Figure()
 
         for country in selected_countries:
-            df_country = df_top_countries[df_top_countries['Entity'] == country]
+            df_country = df[df['Entity'] == country]
             fig.add_trace(
                 go.Scatter(x=df_country['Year'], y=df_country['Annual CO₂ emissions growth (%)'], mode='lines', name=country,
                                        ))
@@ -178,8 +214,7 @@ def update_plot(plot_type, selected_countries, selected_year, growth_range):
            
         )
     else:  # plot_type == 'choropleth'
-        df_year = df[df['Year'] == selected_year]
-        df_top_countries_year = df_top_countries[df_top_countries['Year'] == selected_year]
+        df_top_countries_year = df[df['Year'] == selected_year]
 
         # Filter the data based on the selected growth range
         df_top_countries_year = df_top_countries_year[
@@ -2,12 +2,32 @@ import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from dash import dcc, html, register_page, Input, Output, callback
+from dash import (
+    dcc,
+    html,
+    register_page,
+    Input,
+    Output,
+    State,
+    callback,
+    clientside_callback,
+)
 import dash_mantine_components as dmc
 from assets.constants import months
-from pathlib import Path
 
 from util.content import create_Text
+from util.emissions import (
+    REGIONS,
+    countries,
+    entity_index,
+    load_cube,
+    select,
+    series,
+    share,
+    top_k_range,
+)
+from util.snapshot import cached
+from lib.lazy_graph import create_lazy_graph, placeholder_figure
 
 register_page(
     __name__,
@@ -16,34 +36,17 @@ register_page(
     description="Visualisation of CO2 emission throughout the World",
 )
 
-df_filtered = pd.read_csv(
-    Path(__file__).parents[2]
-    / "Datasets"
-    / "CO2_Emissions"
-    / "CO2_emission_by_countries.csv"
-)
-df = pd.read_csv(
-    Path(__file__).parents[2]
-    / "Datasets"
-    / "CO2_Emissions"
-    / "co-emissions-per-capita.csv"
-)
-
-
-@callback(
-    Output("map-graph", "figure"),
-    Output("mini-graph-container", "figure"),
-    Input("map-graph", "hoverData"),
-)
-def update_map(hoverData):
-    return world_CO2_map(hoverData)
+default_country = "India"
 
 
-def world_CO2_map(hoverData):
-    # Step 2: Filter data for year 2022
-    df_2022 = df[
-        df["Year"] == 2022
-    ].copy()  # Make a copy to avoid SettingWithCopyWarning
+@cached("emissions", maxsize=1, persist=True)
+def world_CO2_map():
+    # Step 2: Per capita emissions of every entity in 2022
+    entities = load_cube()[0]
+    _, values = select(entities, "per_capita", 2022, 2022)
+    df_2022 = pd.DataFrame(
+        {"Entity": entities, "Annual CO₂ emissions (per capita)": values[:, 0]}
+    ).dropna()
 
     # Round the "Annual CO₂ Emissions per Capita (2022)" to 1 decimal place using .loc indexer
     df_2022.loc[:, "Annual CO₂ emissions (per capita)"] = df_2022[
@@ -64,66 +67,79 @@ def world_CO2_map(hoverData):
         color_continuous_scale=px.colors.sequential.YlOrBr,  # Change color scale
         range_color=(0, 20),  # Set color range from 0 to 20t
     )
+    return fig
+
+
+@cached("emissions", maxsize=256, persist=True)
+def create_mini_graph(country_name):
     mini_fig = go.Figure()
-    if hoverData is not None and "points" in hoverData:
-        # Extract country name from hoverData
-        country_name = hoverData["points"][0]["hovertext"]
-
-        # Step 4: Implement hover functionality
-        country_df = df[df["Entity"] == country_name]
-        mini_graph = go.Scatter(
-            x=country_df["Year"],
-            y=country_df["Annual CO₂ emissions (per capita)"],
-            mode="lines+markers",
-            name="CO₂ emissions trend",
-            marker=dict(size=1),
-        )
-        mini_fig.add_trace(mini_graph)
-        mini_fig.update_layout(
-            title="CO₂ emissions (per capita) trend - " + country_name,
-            xaxis_title="Year",
-            yaxis_title="Per Capita CO₂ emissions ",
-        )
-    else:
-        country_name = "India"
-        country_df = df[df["Entity"] == country_name]
-        mini_graph = go.Scatter(
-            x=country_df["Year"],
-            y=country_df["Annual CO₂ emissions (per capita)"],
-            mode="lines+markers",
-            name="CO₂ emissions trend",
-            marker=dict(size=1),
-        )
-        mini_fig.add_trace(mini_graph)
-        mini_fig.update_layout(
-            title="CO₂ emissions (per capita) trend - " + country_name,
-            xaxis_title="Year",
-            yaxis_title="Per Capita CO₂ emissions ",
-        )
+    if country_name not in entity_index():
+        return mini_fig
+
+    years, values = series(country_name, "per_capita")
+    present = ~np.isnan(values)
+    mini_graph = go.Scatter(
+        x=years[present],
+        y=values[present],
+        mode="lines+markers",
+        name="CO₂ emissions trend",
+        marker=dict(size=1),
+    )
+    mini_fig.add_trace(mini_graph)
+    mini_fig.update_layout(
+        title="CO₂ emissions (per capita) trend - " + country_name,
+        xaxis_title="Year",
+        yaxis_title="Per Capita CO₂ emissions ",
+    )
+    return mini_fig
+
+
+# Hover events fire for every point the mouse crosses; only forward them to
+# the server when the hovered country actually changes.
+clientside_callback(
+    """
+    function(hoverData, current) {
+        if (!hoverData || !hoverData.points || !hoverData.points.length) {
+            return dash_clientside.no_update
+        }
+        const country = hoverData.points[0].hovertext
+        return country === current ? dash_clientside.no_update : country
+    }
+    """,
+    Output("hovered-country", "data"),
+    Input("map-graph", "hoverData"),
+    State("hovered-country", "data"),
+)
+
 
-    return fig, mini_fig
+@callback(
+    Output("mini-graph-container", "figure"),
+    Input("hovered-country", "data"),
+)
+def update_mini_graph(country_name):
+    return create_mini_graph(country_name or default_country)
 
 
-def Countries_emitting_most_CO2():
-    global df_filtered
-    # Group the data by country and calculate the total CO2 emissions for each country
-    total_emissions = df_filtered.groupby("Entity")["Annual CO2"].sum().reset_index()
+# The top 8 emitters over all years, from the emissions rank table
+top_emitters = list(top_k_range("annual", None, None, 8)[0])
 
-    # Sort countries by total emissions and select the top 8
-    top_emitters = total_emissions.nlargest(8, "Annual CO2")["Entity"]
-    # Filter the data to include only the top 8 emitters
-    df_filtered = df_filtered[df_filtered["Entity"].isin(top_emitters)]
+# Denominators offered for the share chart, "selected" being the total of the
+# chosen countries themselves
+share_denominators = ["selected", *REGIONS["World"], *REGIONS["Continent"]]
 
+
+def Countries_emitting_most_CO2():
     # Create a Plotly graph
     fig1 = go.Figure()
 
     # Iterate over each country to plot
-    for country in total_emissions["Entity"]:
-        country_data = df_filtered[df_filtered["Entity"] == country]
+    for country in top_emitters:
+        years, emissions = series(country)
+        present = ~np.isnan(emissions)
         fig1.add_trace(
             go.Scatter(
-                x=country_data["Year"],
-                y=country_data["Annual CO2"],
+                x=years[present],
+                y=emissions[present],
                 mode="lines",
                 name=country,
             )
@@ -141,35 +157,33 @@ def Countries_emitting_most_CO2():
     return fig1
 
 
-def Percentage_Share_of_CO2_per_country():
-    global df_filtered
-
-    # Group the data by year and calculate the total CO2 emissions for each year
-    total_emissions_yearly = df_filtered.groupby("Year")["Annual CO2"].sum()
-
-    # Group the data by country and calculate the total CO2 emissions for each country
-    total_emissions_country = df_filtered.groupby("Entity")["Annual CO2"].sum()
-
-    # Sort countries by total emissions and select the top 8
-    top_emitters = total_emissions_country.nlargest(8).index
+def Percentage_Share_of_CO2_per_country(
+    selected_countries=None, denominator="selected"
+):
+    selected_countries = selected_countries or top_emitters
+    years, shares = share(
+        selected_countries, None if denominator == "selected" else denominator
+    )
 
     # Create a Plotly graph
     fig = go.Figure()
 
     # Iterate over each country to plot
-    for country in top_emitters:
-        # Calculate the share of CO2 emissions for each country
-        share = (
-            df_filtered[df_filtered["Entity"] == country]
-            .groupby("Year")["Annual CO2"]
-            .sum()
-            / total_emissions_yearly
-        ) * 100
-        fig.add_trace(go.Scatter(x=share.index, y=share, mode="lines", name=country))
+    for country, country_share in zip(selected_countries, shares):
+        present = ~np.isnan(country_share)
+        fig.add_trace(
+            go.Scatter(
+                x=years[present], y=country_share[present], mode="lines", name=country
+            )
+        )
 
     # Update layout
     fig.update_layout(
-        title="Share of CO2 Emissions by Top 8 Countries",
+        title=(
+            "Share of CO2 Emissions by Selected Countries"
+            if denominator == "selected"
+            else f"Share of {denominator} CO2 Emissions by Country"
+        ),
         xaxis_title="Year",
         yaxis_title="Share of CO2 Emissions (%)",
         hovermode="x unified",
@@ -179,13 +193,18 @@ def Percentage_Share_of_CO2_per_country():
     return fig
 
 
-def World_CO2_emission():
-    global df_filtered
+@callback(
+    Output("Percentage-CO2-Countries", "figure"),
+    Input("share-countries", "value"),
+    Input("share-denominator", "value"),
+    prevent_initial_call=True,
+)
+def update_share_plot(selected_countries, denominator):
+    return Percentage_Share_of_CO2_per_country(selected_countries, denominator)
 
-    # Group the data by year and calculate the total CO2 emissions for each year
-    total_world_emissions = (
-        df_filtered.groupby("Year")["Annual CO2"].sum().reset_index()
-    )
+
+def World_CO2_emission():
+    years, total_world_emissions = series("World")
 
     # Create a Plotly graph
     fig1 = go.Figure()
@@ -193,8 +212,8 @@ def World_CO2_emission():
     # Plot total world emissions
     fig1.add_trace(
         go.Scatter(
-            x=total_world_emissions["Year"],
-            y=total_world_emissions["Annual CO2"],
+            x=years,
+            y=total_world_emissions,
             mode="lines",
             name="World",
             line=dict(color="black"),
@@ -226,16 +245,13 @@ It's essential to note that these figures are based on production-based emission
             children=[
                 dmc.Col(
                     [
-                        dcc.Graph(id="map-graph", figure=world_CO2_map(None)[0]),
+                        dcc.Store(id="hovered-country", data=default_country),
+                        create_lazy_graph("map-graph", world_CO2_map),
                     ],
                     span=12,
                 ),
                 dmc.Col(
-                    [
-                        dcc.Graph(
-                            id="mini-graph-container", figure=world_CO2_map(None)[1]
-                        )
-                    ],
+                    [dcc.Graph(id="mini-graph-container", figure=placeholder_figure())],
                     span=12,
                 ),
                 html.P(
@@ -260,16 +276,48 @@ It's essential to note that these figures are based on production-based emission
                     ]
                 ),
                 dmc.Col(
-                    dcc.Graph(
-                        id="CO2-emm-top-countries",
-                        figure=Countries_emitting_most_CO2(),
+                    create_lazy_graph(
+                        "CO2-emm-top-countries", Countries_emitting_most_CO2
                     ),
                     span=12,
                 ),
                 dmc.Col(
-                    dcc.Graph(
-                        id="Percentage-CO2-Countries",
-                        figure=Percentage_Share_of_CO2_per_country(),
+                    dmc.MultiSelect(
+                        id="share-countries",
+                        label="Countries",
+                        data=list(countries()),
+                        value=top_emitters,
+                        searchable=True,
+                    ),
+                    span=8,
+                ),
+                dmc.Col(
+                    dmc.Select(
+                        id="share-denominator",
+                        label="Share of",
+                        data=[
+                            {
+                                "label": (
+                                    "Selected countries"
+                                    if denominator == "selected"
+                                    else denominator
+                                ),
+                                "value": denominator,
+                            }
+                            for denominator in share_denominators
+                        ],
+                        value="selected",
+                    ),
+                    span=4,
+                ),
+                dmc.Col(
+                    create_lazy_graph(
+                        "Percentage-CO2-Countries",
+                        Percentage_Share_of_CO2_per_country,
+                        state=[
+                            ("share-countries", "value"),
+                            ("share-denominator", "value"),
+                        ],
                     ),
                     span=12,
                 ),
@@ -277,10 +325,7 @@ It's essential to note that these figures are based on production-based emission
                     "We notice that till 1792, almost all the CO2 was emitted by the United Kingdom. However, around 1890, we noticed that the US overtook the UK in carbon emission share. This happened owing to massive large-scale industrialisation and the burning of fossil fuels in the US."
                 ),
                 dmc.Col(
-                    dcc.Graph(
-                        id="World-CO2-emm",
-                        figure=World_CO2_emission(),
-                    ),
+                    create_lazy_graph("World-CO2-emm", World_CO2_emission),
                     span=12,
                 ),
             ],
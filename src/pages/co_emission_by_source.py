@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from dash import dcc, html, register_page, Input, Output, callback
@@ -5,6 +6,7 @@ import dash_mantine_components as dmc
 from pathlib import Path
 
 from util.content import create_Text
+from lib.export import create_export_links, iter_rows
 
 register_page(
     __name__,
@@ -50,6 +52,21 @@ df_sorted = df.sort_values(by="Total CO₂ emissions", ascending=True)
 # Get top three countries by default
 default_entities = ["World", "India", "United States", "China", "South America"]
 
+sources = ["coal", "oil", "gas", "flaring", "cement", "other"]
+
+
+def select_sources(selected_entities, selected_year):
+    # Positions of the rows shown in the bar chart, shared with its export
+    return np.flatnonzero(
+        (df["Entity"].isin(selected_entities or [])) & (df["Year"] == selected_year)
+    )
+
+
+def export_sources(selected_entities, selected_year):
+    rows = select_sources(selected_entities, selected_year)
+    return iter_rows(df, rows, ["Entity", "Code", "Year", *sources])
+
+
 # Initialize the Dash app
 
 # Define the layout of the app
@@ -74,6 +91,16 @@ layout = html.Div(
                     span=12,
                 ),
                 dmc.Col(dcc.Graph(id="bar-chart"), span=12),
+                dmc.Col(
+                    create_export_links(
+                        "bar-chart-export",
+                        "co2_by_source",
+                        [("country-dropdown", "value"), ("year-slider", "value")],
+                        export_sources,
+                        ["strings", "number"],
+                    ),
+                    span=12,
+                ),
                 dmc.Col(
                     dmc.Slider(
                         id="year-slider",
@@ -142,9 +169,7 @@ layout = html.Div(
 )
 def update_bar_chart(selected_entities, selected_year):
     # Filter data for selected year and entities
-    selected_data = df[
-        (df["Entity"].isin(selected_entities)) & (df["Year"] == selected_year)
-    ].copy()
+    selected_data = df.iloc[select_sources(selected_entities, selected_year)]
 
     # Create traces for each source
     traces_sources = []
@@ -156,9 +181,7 @@ def update_bar_chart(selected_entities, selected_year):
         "#008000",
         "#0000AA",
     ]  # Black, Red, Purple, Brown, Green, Blue
-    for i, source_column in enumerate(
-        ["coal", "oil", "gas", "flaring", "cement", "other"]
-    ):
+    for i, source_column in enumerate(sources):
         hover_text = [
             f"{source_column}: {value:.2f}" if value >= 1 else ""
             for value in selected_data[source_column]
@@ -1,12 +1,12 @@
 import numpy as np
-import pandas as pd
 import plotly.graph_objects as go
 from dash import dcc, html, register_page, Input, Output, callback
 import dash_mantine_components as dmc
 from assets.constants import months
-from pathlib import Path
 
 from util.content import create_Text
+from util.correlation import correlation, year_range
+from util.snapshot import cached
 
 register_page(
     __name__,
@@ -15,17 +15,19 @@ register_page(
     description="Visualisation of GDP data and Correlation with C02 and Temperature",
 )
 
-emm_gdp = pd.read_excel(
-    Path(__file__).parents[2]
-    / "Datasets"
-    / "GDP"
-    / "Correlation - Emissions vs GDP.xlsx",
-    sheet_name="Correlation-Country",
-)
-temp_gdp = pd.read_excel(
-    Path(__file__).parents[2] / "Datasets" / "GDP" / "Correlation - GDP vs Temp.xlsx",
-    sheet_name="Correlation-Method 2",
-)
+
+def load_correlations(window=None):
+    start, end = window or (None, None)
+    return (
+        correlation("emissions_gdp", start, end).rename(columns={"Correlation": "Rho"}),
+        correlation("gdp_temperature", start, end).rename(
+            columns={"Correlation": "Rho"}
+        ),
+    )
+
+
+emm_gdp, temp_gdp = load_correlations()
+min_corr_year, max_corr_year = year_range("emissions_gdp")
 
 continents = emm_gdp["Continent"].unique()
 continents = np.append(continents, "World")
@@ -95,6 +97,18 @@ def create_gdp_temp_graph(temp_gdp):
     return fig
 
 
+@cached("correlation", maxsize=64, persist=True)
+def create_gdp_maps(continent="World", window=None):
+    emm_gdp, temp_gdp = load_correlations(window)
+    if continent != "World":
+        emm_gdp = emm_gdp[emm_gdp["Continent"] == continent]
+        temp_gdp = temp_gdp[temp_gdp["Continent"] == continent]
+    return create_emm_gdp_graph(emm_gdp), create_gdp_temp_graph(temp_gdp)
+
+
+emm_gdp_map, gdp_temp_map = create_gdp_maps()
+
+
 def Tile(title, corr, country):
     return dmc.Card(
         radius="md",
@@ -118,6 +132,18 @@ def create_select_continent():
     )
 
 
+def create_window_slider():
+    return dcc.RangeSlider(
+        id="gdp-correlation-window",
+        min=min_corr_year,
+        max=max_corr_year,
+        step=1,
+        value=[min_corr_year, max_corr_year],
+        marks={year: str(year) for year in range(min_corr_year, max_corr_year + 1, 5)},
+        tooltip={"placement": "top"},
+    )
+
+
 layout = html.Div(
     [
         dmc.Text("GDP Visualisation", align="center", style={"fontSize": 30}),
@@ -130,7 +156,10 @@ layout = html.Div(
 """
         ),
         dmc.Container(
-            create_select_continent(),
+            [
+                create_select_continent(),
+                create_window_slider(),
+            ],
             size="lg",
             pt=20,
             style={
@@ -148,7 +177,7 @@ layout = html.Div(
                 dmc.Col(
                     dcc.Graph(
                         id="emm-gdp-graph",
-                        figure=create_emm_gdp_graph(emm_gdp),
+                        figure=emm_gdp_map,
                         style={"height": "60vh"},
                     ),
                     span=12,
@@ -190,7 +219,7 @@ layout = html.Div(
                 dmc.Col(
                     dcc.Graph(
                         id="gdp-temp-graph",
-                        figure=create_gdp_temp_graph(temp_gdp),
+                        figure=gdp_temp_map,
                         style={"height": "60vh"},
                     ),
                     span=12,
@@ -244,9 +273,13 @@ layout = html.Div(
         Output("lowest-temp-tile", "children"),
         Output("average-temp-tile", "children"),
     ],
-    [Input("continent-select", "value")],
+    [
+        Input("continent-select", "value"),
+        Input("gdp-correlation-window", "value"),
+    ],
 )
-def update_graphs(continent):
+def update_graphs(continent, window=None):
+    emm_gdp, temp_gdp = load_correlations(window)
     if continent == "World":
         emm_gdp_filtered = emm_gdp
         temp_gdp_filtered = temp_gdp
@@ -254,8 +287,9 @@ def update_graphs(continent):
         emm_gdp_filtered = emm_gdp[emm_gdp["Continent"] == continent]
         temp_gdp_filtered = temp_gdp[temp_gdp["Continent"] == continent]
 
-    emm_gdp_fig = create_emm_gdp_graph(emm_gdp_filtered)
-    gdp_temp_fig = create_gdp_temp_graph(temp_gdp_filtered)
+    emm_gdp_fig, gdp_temp_fig = create_gdp_maps(
+        continent, tuple(window) if window else None
+    )
 
     highest_gdp_country, lowest_gdp_country = (
         emm_gdp_filtered.iloc[np.argmax(emm_gdp_filtered["Rho"]), :],
@@ -2,12 +2,25 @@ import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from dash import dcc, html, register_page, Input, Output, callback
+from dash import (
+    dcc,
+    html,
+    register_page,
+    Input,
+    Output,
+    State,
+    callback,
+    ctx,
+    no_update,
+)
 import dash_mantine_components as dmc
 from assets.constants import months
 from pathlib import Path
 import math
 
+from util.correlation import correlation, rolling_frame, year_range
+from util.snapshot import cached, register
+
 register_page(
     __name__,
     "/population_vis",
@@ -15,28 +28,29 @@ register_page(
     description="Visualisation of Population throughout the World",
 )
 
-co2 = pd.read_csv(
-    Path(__file__).parents[2]
-    / "Datasets"
-    / "Correlation Data"
-    / "correlation - co2 vs population.csv"
-)
-temp = pd.read_csv(
-    Path(__file__).parents[2]
-    / "Datasets"
-    / "Correlation Data"
-    / "correlation_temperature.csv"
-)
+min_corr_year, max_corr_year = year_range("co2_population")
+ROLLING_LENGTHS = ["10", "15", "20", "30"]
+DEFAULT_ROLLING_LENGTH = "15"
 
-population = pd.read_csv("Datasets/population_and_co2/population_and_co2.csv")
-population["Density (P/Km²)"] = population["Density (P/Km²)"].apply(
-    lambda x: math.log2(x + 1)
-)
+population_path = Path("Datasets/population_and_co2/population_and_co2.csv")
+
+
+@cached("population", maxsize=None)
+def load_population():
+    population = pd.read_csv(population_path)
+    population["Density (P/Km²)"] = population["Density (P/Km²)"].apply(
+        lambda x: math.log2(x + 1)
+    )
+    return population
 
 
+register("population", [population_path], warm=[load_population])
+
+
+@cached("population", maxsize=1, persist=True)
 def create_population_graph():
     fig = px.scatter(
-        population,
+        load_population(),
         x="Annual CO₂ emissions",
         y="Population (2020)",
         size="Land Area (Km²)",
@@ -62,15 +76,14 @@ def create_population_graph():
     return fig
 
 
-
 @callback(Output("heatmap-graph", "figure"), [Input("heatmap-graph", "hoverData")])
 def update_map(hoverData):
     return updateco2_heatmap(hoverData)
 
 
-def updateco2_heatmap(hoverData):
+def updateco2_heatmap(hoverData, data=None):
     fig = px.choropleth(
-        co2,
+        correlation("co2_population") if data is None else data,
         locations="Country",
         locationmode="country names",
         color="Correlation",
@@ -92,9 +105,9 @@ def updateco2_heatmap(hoverData):
     return fig
 
 
-def updatetemp_heatmap(hoverData):
+def updatetemp_heatmap(hoverData, data=None):
     fig = px.choropleth(
-        temp,
+        correlation("temperature_population") if data is None else data,
         locations="Country",
         locationmode="country names",
         color="Correlation",
@@ -131,16 +144,61 @@ layout = html.Div(
                     ),
                     span=12,
                 ),
-
                 html.P(
                     "In the above bubble chart,direct correlation between the population and the CO2 emission of the countries can be clearly observed: as population increases, CO2 emission increases as well."
                 ),
                 html.P(
                     "Another dimension that can be easily observed from the bubble chart is the size of the bubbles, which represents the land area of every country. Moreover, color functionality allows us to see another dimension in the same chart: the density of every country. Again, not to see the correlation, but just to observe the country density along with all other features in just one visual."
                 ),
+                html.P(
+                    "The correlations below are computed over the years selected here:"
+                ),
+                dmc.Col(
+                    dcc.RangeSlider(
+                        id="correlation-window",
+                        min=min_corr_year,
+                        max=max_corr_year,
+                        step=1,
+                        value=[min_corr_year, max_corr_year],
+                        marks={
+                            year: str(year)
+                            for year in range(min_corr_year, max_corr_year + 1, 10)
+                        },
+                        tooltip={"placement": "bottom"},
+                    ),
+                    span=12,
+                ),
+                html.P(
+                    "Or slide a window of fixed length through the years to see how the correlations evolve:"
+                ),
+                dmc.Col(
+                    dmc.Select(
+                        id="rolling-length",
+                        label="Rolling window (years)",
+                        data=ROLLING_LENGTHS,
+                        value=DEFAULT_ROLLING_LENGTH,
+                    ),
+                    span=3,
+                ),
+                dmc.Col(
+                    dcc.Slider(
+                        id="rolling-end",
+                        # The first year ending a full window
+                        min=min_corr_year + int(DEFAULT_ROLLING_LENGTH) - 1,
+                        max=max_corr_year,
+                        step=1,
+                        value=max_corr_year,
+                        marks={
+                            year: str(year)
+                            for year in range(min_corr_year, max_corr_year + 1, 10)
+                        },
+                        tooltip={"placement": "bottom"},
+                    ),
+                    span=9,
+                ),
                 dmc.Col(
                     dcc.Graph(
-                        id="CO2-emm-top-countries",
+                        id="co2-population-heatmap",
                         figure=updateco2_heatmap(None),
                     ),
                     span=12,
@@ -157,7 +215,7 @@ layout = html.Div(
                 ),
                 dmc.Col(
                     dcc.Graph(
-                        id="Percentage-CO2-Countries",
+                        id="temperature-population-heatmap",
                         figure=updatetemp_heatmap(None),
                     ),
                     span=12,
@@ -172,8 +230,42 @@ layout = html.Div(
                 html.P(
                     " While negative correlations are predominant, there are notable exceptions. Some countries, like Luxembourg and Sweden, show positive correlations between temperature and population growth. This could be due to various factors such as robust economies, social policies, or geographic advantages that mitigate the adverse effects of temperature on population growth. Understanding the unique circumstances of these outliers can provide valuable insights into the complex relationship between temperature and population dynamics"
                 ),
-                
             ],
         ),
     ]
 )
+
+
+@callback(
+    Output("rolling-end", "min"),
+    Output("rolling-end", "value"),
+    Input("rolling-length", "value"),
+    State("rolling-end", "value"),
+    prevent_initial_call=True,
+)
+def update_rolling_end(rolling_length, rolling_end):
+    # Windows ending before this year would start before the data
+    first_end = min_corr_year + int(rolling_length or DEFAULT_ROLLING_LENGTH) - 1
+    if rolling_end is not None and rolling_end < first_end:
+        return first_end, first_end
+    return first_end, no_update
+
+
+@callback(
+    Output("co2-population-heatmap", "figure"),
+    Output("temperature-population-heatmap", "figure"),
+    Input("correlation-window", "value"),
+    Input("rolling-length", "value"),
+    Input("rolling-end", "value"),
+    prevent_initial_call=True,
+)
+def update_heatmaps(window, rolling_length, rolling_end):
+    # Whichever control was moved last decides the window
+    if ctx.triggered_id in ("rolling-length", "rolling-end") and rolling_length:
+        length = int(rolling_length)
+        co2 = rolling_frame("co2_population", length, rolling_end)
+        temp = rolling_frame("temperature_population", length, rolling_end)
+    else:
+        co2 = correlation("co2_population", *window)
+        temp = correlation("temperature_population", *window)
+    return updateco2_heatmap(None, co2), updatetemp_heatmap(None, temp)
@@ -0,0 +1,371 @@
+"""
+Benchmark the figure builders and data-slice functions of every page.
+
+Run from the repository root:
+
+    python src/tools/benchmark.py run                       # all cases
+    python src/tools/benchmark.py run -k surface --repeat 10
+    python src/tools/benchmark.py run --output bench-new.json
+    python src/tools/benchmark.py compare bench-old.json bench-new.json
+
+Every case calls one builder with fixed inputs, sweeping years and selection
+sizes. ``run`` reports the best/median wall time, the peak memory allocated
+during one call and the serialized size of the returned figure. Every call
+starts cold: the caches of ``util.snapshot`` are emptied (the datasets
+themselves stay loaded, as after a reload) and the figure store is closed,
+so nothing a builder derives is served from an earlier call. ``compare``
+flags cases whose median time or peak memory grew by more than
+``--threshold`` and exits non-zero if any did.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import plotly.io as pio
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+YEARS = [1800, 1900, 1950, 2000, 2013]
+SELECTION_SIZES = [1, 5, 20, 50]
+
+
+def collect_cases():
+    # Pages can only be imported once the Dash app with use_pages exists.
+    import app  # noqa: F401
+    from pages import (
+        annual_co2_emission_by_country,
+        co2_vis,
+        co_emission_by_source,
+        gdp_vis,
+        surface_temp_vis,
+    )
+    from util import (
+        climate_spiral,
+        correlation,
+        disk_cache,
+        emissions,
+        temperature,
+        trends,
+    )
+
+    # Figures read back from the store would time the store, not the builder
+    disk_cache.close_store()
+
+    cases = []
+
+    def add(name, func, *args):
+        cases.append((name, func, args))
+
+    for year in YEARS + [2023]:
+        add(
+            f"surface_temp_vis.getMeanTemperature[year={year}]",
+            surface_temp_vis.getMeanTemperature,
+            year,
+        )
+        add(
+            f"surface_temp_vis.create_surface_plot[year={year}]",
+            surface_temp_vis.create_surface_plot,
+            year,
+        )
+        add(
+            f"surface_temp_vis.create_surface_plot[year={year},anomaly]",
+            surface_temp_vis.create_surface_plot,
+            year,
+            "anomaly",
+            (1951, 1980),
+        )
+    for baseline in [(1951, 1980), (1850, 1900)]:
+        add(
+            f"temperature.annual_anomaly[{baseline[0]}-{baseline[1]}]",
+            temperature.annual_anomaly,
+            *baseline,
+        )
+        add(
+            f"temperature.monthly_anomaly[{baseline[0]}-{baseline[1]}]",
+            temperature.monthly_anomaly,
+            *baseline,
+        )
+    for year in YEARS:
+        for size in SELECTION_SIZES:
+            selection = list(temperature.annual_matrix()[0][:size])
+            add(
+                f"surface_temp_vis.create_country_temp_plot[year={year},countries={size}]",
+                surface_temp_vis.create_country_temp_plot,
+                year,
+                selection,
+            )
+    for start in [1850, 1880, 1950]:
+        add(
+            f"climate_spiral.spiral_coordinates[start={start}]",
+            climate_spiral.spiral_coordinates,
+            start,
+        )
+    for year in [1900, 1950, 2000, 2024]:
+        add(
+            f"climate_spiral.create_climate_spiral[year={year}]",
+            climate_spiral.create_climate_spiral,
+            year,
+        )
+
+    add("emissions.load_cube", emissions.load_cube)
+    for level in emissions.REGIONS:
+        add(f"emissions.rollups[level={level}]", emissions.rollups, level)
+    for metric in [*emissions.METRICS, *emissions.DERIVED]:
+        add(f"emissions.rank_table[metric={metric}]", emissions.rank_table, metric)
+        add(f"emissions.top_k[metric={metric},k=10]", emissions.top_k, metric, 2016, 10)
+    for denominator in ["World", "Asia", None]:
+        add(
+            f"emissions.share[countries=all,denominator={denominator}]",
+            emissions.share,
+            tuple(emissions.countries()),
+            denominator,
+        )
+    add("emissions.prefix_sums[metric=annual]", emissions.prefix_sums, "annual")
+    for start, end in [(2000, 2022), (1750, 2022)]:
+        add(
+            f"emissions.top_k_range[annual,{start}-{end},k=20]",
+            emissions.top_k_range,
+            "annual",
+            start,
+            end,
+            20,
+        )
+        add(
+            f"annual_co2_emission_by_country.create_top_20_plot[{start}-{end}]",
+            annual_co2_emission_by_country.create_top_20_plot,
+            start,
+            end,
+        )
+    for window, smoothing in [(1, 1), (5, 1), (1, 5)]:
+        add(
+            f"emissions.growth_frame[window={window},smoothing={smoothing}]",
+            emissions.growth_frame,
+            window,
+            smoothing,
+        )
+    add(
+        "emissions.select_frame[regions=5]",
+        emissions.select_frame,
+        ("United States", "Europe", "Asia", "Africa", "Oceania"),
+    )
+
+    add("co2_vis.world_CO2_map", co2_vis.world_CO2_map)
+    for country in ["India", "United States", "World"]:
+        add(
+            f"co2_vis.create_mini_graph[country={country}]",
+            co2_vis.create_mini_graph,
+            country,
+        )
+    add("co2_vis.Countries_emitting_most_CO2", co2_vis.Countries_emitting_most_CO2)
+    add(
+        "co2_vis.Percentage_Share_of_CO2_per_country",
+        co2_vis.Percentage_Share_of_CO2_per_country,
+    )
+    add("co2_vis.World_CO2_emission", co2_vis.World_CO2_emission)
+
+    available = list(annual_co2_emission_by_country.available_countries)
+    for size in SELECTION_SIZES:
+        add(
+            f"annual_co2_emission_by_country.update_choropleth[countries={size}]",
+            annual_co2_emission_by_country.update_choropleth,
+            available[:size],
+        )
+    add(
+        "annual_co2_emission_by_country.update_choropleth[countries=all]",
+        annual_co2_emission_by_country.update_choropleth,
+        None,
+    )
+
+    entities = list(co_emission_by_source.entities)
+    for year in [1900, 1950, 2000, 2022]:
+        for size in SELECTION_SIZES:
+            add(
+                f"co_emission_by_source.update_bar_chart[year={year},entities={size}]",
+                co_emission_by_source.update_bar_chart,
+                entities[:size],
+                year,
+            )
+
+    for continent in gdp_vis.continents:
+        emm_gdp = gdp_vis.emm_gdp
+        if continent != "World":
+            emm_gdp = emm_gdp[emm_gdp["Continent"] == continent]
+        add(
+            f"gdp_vis.create_emm_gdp_graph[continent={continent}]",
+            gdp_vis.create_emm_gdp_graph,
+            emm_gdp,
+        )
+
+    for name in correlation.PAIRS:
+        first, last = correlation.year_range(name)
+        for start in [first, (first + last) // 2]:
+            for method in correlation.METHODS:
+                add(
+                    f"correlation.correlation[{name},{start}-{last},{method}]",
+                    correlation.correlation,
+                    name,
+                    start,
+                    last,
+                    method,
+                )
+        for length in [10, 20]:
+            add(
+                f"correlation.rolling_correlation[{name},length={length}]",
+                correlation.rolling_correlation,
+                name,
+                length,
+            )
+
+    for series in trends.SERIES:
+        add(
+            f"trends.linear_trends[{series},1950-2013]",
+            trends.linear_trends,
+            series,
+            1950,
+            2013,
+        )
+        add(
+            f"trends.piecewise_trends[{series},1950-2013]",
+            trends.piecewise_trends,
+            series,
+            1950,
+            2013,
+        )
+    add(
+        "surface_temp_vis.create_warming_rate_map",
+        surface_temp_vis.create_warming_rate_map,
+    )
+
+    return cases
+
+
+def _output_bytes(result):
+    if isinstance(result, tuple):
+        return sum(_output_bytes(r) for r in result)
+    if hasattr(result, "to_plotly_json"):
+        return len(pio.to_json(result, validate=False))
+    if hasattr(result, "memory_usage"):
+        return int(result.memory_usage(deep=True).sum())
+    return getattr(result, "nbytes", 0)
+
+
+def measure(func, args, repeat, datasets=()):
+    from util import snapshot
+
+    # Time the builder itself, not a memoized result of it or of the cached
+    # helpers it calls
+    func = getattr(func, "__wrapped__", func)
+    snapshot.clear_caches(keep=datasets)
+    result = func(*args)  # warm-up, also used for the output size
+
+    times = []
+    for _ in range(repeat):
+        snapshot.clear_caches(keep=datasets)
+        started = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - started)
+
+    snapshot.clear_caches(keep=datasets)
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "min_ms": min(times) * 1000,
+        "median_ms": statistics.median(times) * 1000,
+        "mean_ms": statistics.mean(times) * 1000,
+        "peak_kib": peak / 1024,
+        "output_bytes": _output_bytes(result),
+    }
+
+
+def run(args):
+    from util import snapshot
+
+    results = {}
+    cases = collect_cases()
+    # What every call starts from: the datasets loaded, nothing derived
+    datasets = snapshot.loaded()
+    for name, func, func_args in cases:
+        if args.k and not any(k in name for k in args.k):
+            continue
+        results[name] = measure(func, func_args, args.repeat, datasets)
+        r = results[name]
+        print(
+            f"{name:<80} {r['median_ms']:>9.2f}ms {r['min_ms']:>9.2f}ms "
+            f"{r['peak_kib']:>10.0f}KiB {r['output_bytes']:>10}B"
+        )
+
+    output = args.output or f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+    Path(output).write_text(
+        json.dumps(
+            {
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "repeat": args.repeat,
+                "python": sys.version.split()[0],
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+    print(f"\nSaved results to {output}")
+
+
+def compare(args):
+    old = json.loads(Path(args.old).read_text())["results"]
+    new = json.loads(Path(args.new).read_text())["results"]
+
+    regressions = 0
+    for name in sorted(set(old) & set(new)):
+        flags = []
+        for key in ("median_ms", "peak_kib"):
+            if old[name][key] > 0:
+                change = new[name][key] / old[name][key] - 1
+                if change > args.threshold:
+                    flags.append(f"{key} {change:+.0%}")
+        time_change = new[name]["median_ms"] / max(old[name]["median_ms"], 1e-9) - 1
+        line = f"{name:<80} {old[name]['median_ms']:>9.2f}ms -> {new[name]['median_ms']:>9.2f}ms ({time_change:+.0%})"
+        if flags:
+            regressions += 1
+            line += "  REGRESSION: " + ", ".join(flags)
+        print(line)
+
+    for name in sorted(set(old) ^ set(new)):
+        print(f"{name:<80} only in {'old' if name in old else 'new'} run")
+
+    print(f"\n{regressions} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument(
+        "-k", action="append", help="Only run cases containing this text"
+    )
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("--output", help="Where to save the results (JSON)")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.10)
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        run(args)
+        return 0
+    return compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
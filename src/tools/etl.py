@@ -0,0 +1,432 @@
+"""
+Rebuild the derived datasets the pages load from their sources.
+
+Run from the repository root:
+
+    python src/tools/etl.py                          # rebuild what is out of date
+    python src/tools/etl.py --list                   # show stages and their state
+    python src/tools/etl.py global_mean_temp         # one stage and its inputs
+    python src/tools/etl.py --force                  # rebuild everything
+    python src/tools/etl.py --check                  # compare a rebuild with
+                                                     # the current artifacts
+
+Every stage reads files under ``Datasets/`` and writes one artifact there.
+A stage depends on another when it reads that stage's output, and stages
+run in dependency order. The content hashes of every input and of the
+stage's own code are recorded in ``Datasets/.etl-manifest.json``; a stage
+is rebuilt only when one of them changed or its output is missing.
+
+Sources that are not shipped with the repository (the raw Berkeley Earth
+table and NASA's GISTEMP table) are optional: when one is missing the stage
+keeps the existing artifact and the stages after it build from that. The
+raw table is only read by ``monthly_temp_cube``, which streams it into a
+compact cube that the app and the later stages load instead.
+
+An artifact the manifest has no entry for was made by hand (or by the
+notebooks) and is only replaced with ``--force``. ``--check`` rebuilds every
+stage whose sources are available into a copy of ``Datasets/`` and reports
+where the result differs from the files there.
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+DATASETS = Path(__file__).parents[2] / "Datasets"
+SURFACE = "Surface Temperatures"
+
+# Names of the recent table's rows in AnnualTempByCountry.xlsx, where they
+# differ from the recent table's own
+RENAMES = {
+    "St. Kitts and Nevis": "Saint Kitts And Nevis",
+    "St. Lucia": "Saint Lucia",
+    "St. Vincent and the Grenadines": "Saint Vincent And The Grenadines",
+}
+
+# Rows of the recent table whose history is under another name in the raw
+# table, as they were matched when the workbook was put together
+HISTORY_ALIASES = {
+    "Korea (North)": "North Korea",
+    "Korea, Dem. People's Rep. of": "South Korea",
+    "Saint Helena": "Sint Maarten",
+}
+
+# Summary columns of the GISTEMP table next to the months
+GISTEMP_SUMMARIES = ["J-D", "D-N", "DJF", "MAM", "JJA", "SON"]
+
+# Largest difference --check accepts between a rebuilt and a committed value
+TOLERANCE = 1e-6
+
+
+def build_monthly_temp_cube(raw, output):
+    from util.temperature import ingest_monthly
+
+    ingest_monthly(raw, output)
+
+
+def build_parsed_surface_temp(cube, output):
+    # Mean temperature per country and year, one column per year
+    with np.load(cube) as saved:
+        parsed = pd.DataFrame(
+            saved["annual"],
+            index=pd.Index(saved["countries"], name="Country"),
+            columns=saved["years"],
+        )
+    parsed.to_csv(output)
+
+
+def _years(table):
+    # Year columns as ints, the index as the country
+    table = table.set_index("Country")
+    table.columns = table.columns.astype(int)
+    return table
+
+
+def build_global_mean_temp(parsed, later, output):
+    # Mean over the countries with data in each year of the raw table, then
+    # over the countries of the later table for the years after it
+    parsed = _years(pd.read_csv(parsed))
+    later = _years(pd.read_csv(later))
+    mean = parsed.mean(axis=0)
+    mean = pd.concat([mean, later.loc[:, later.columns > mean.index[-1]].mean()])
+    mean.rename_axis("Year").rename("MeanTemp").to_csv(output)
+
+
+def build_annual_temp_by_country(parsed, recent, output):
+    # The countries of the recent table (the workbook's own "1999-2023"
+    # sheet, kept as a CSV source), in its order, with the raw table's
+    # history before its first year. This leaves out the continents and the
+    # other aggregates of the raw table, and the countries it has no history
+    # for.
+    parsed = _years(pd.read_csv(parsed))
+    recent = _years(pd.read_csv(recent))
+    complete = recent.rename(index=RENAMES)
+    sources = pd.Index([HISTORY_ALIASES.get(name, name) for name in complete.index])
+    found = sources.isin(parsed.index)
+    history = parsed.loc[sources[found], parsed.columns < recent.columns[0]]
+    history.index = complete.index[found]
+    complete = pd.concat([history, complete[found]], axis=1)
+
+    sheet = f"{recent.columns[0]}-{recent.columns[-1]}"
+    with pd.ExcelWriter(output) as writer:
+        recent.reset_index().to_excel(writer, sheet_name=sheet, index=False)
+        complete.reset_index().to_excel(writer, sheet_name="Complete", index=False)
+
+
+def build_climate_spiral(gistemp, output):
+    # Climate_Spiral.ipynb: every month of GISTEMP's global table
+    # (https://data.giss.nasa.gov/gistemp/tabledata_v4/GLB.Ts+dSST.csv) as a
+    # point of the spiral, its anomaly scaled between the table's extremes
+    from assets.constants import months
+    from util.climate_spiral import temp_to_r
+
+    # "***" marks the months without a value yet; like the notebook's
+    # converters, every column is read as a float
+    table = pd.read_csv(gistemp, skiprows=1, na_values="***").astype(float)
+    table = table.drop(columns=GISTEMP_SUMMARIES)
+    monthly = table[months].to_numpy().T
+    temp_min, temp_max = np.nanmin(monthly), np.nanmax(monthly)
+
+    theta = np.radians(np.arange(len(months)) * 30)[:, None]
+    r = temp_to_r(monthly - temp_min, temp_min, temp_max)
+    coordinates = pd.DataFrame(
+        {
+            "x": (r * np.cos(theta)).ravel(),
+            "y": (r * np.sin(theta)).ravel(),
+            "z": np.tile(table["Year"].to_numpy(), len(months)),
+            "radian": np.repeat(theta.ravel(), len(table)),
+        }
+    )
+    coordinates.sort_values(["z", "radian"]).to_csv(output)
+
+
+STAGES = {
+    "monthly_temp_cube": dict(
+        inputs=[f"{SURFACE}/GlobalLandTemperaturesByCountry.csv"],
+        output=f"{SURFACE}/MonthlyTempByCountry.npz",
+        build=build_monthly_temp_cube,
+    ),
+    "parsed_surface_temp": dict(
+        inputs=[f"{SURFACE}/MonthlyTempByCountry.npz"],
+        output=f"{SURFACE}/ParsedSurfaceTemp.csv",
+        build=build_parsed_surface_temp,
+    ),
+    "annual_temp_by_country": dict(
+        inputs=[
+            f"{SURFACE}/ParsedSurfaceTemp.csv",
+            f"{SURFACE}/AnnualTempByCountry_1999-2023.csv",
+        ],
+        output=f"{SURFACE}/AnnualTempByCountry.xlsx",
+        build=build_annual_temp_by_country,
+    ),
+    "global_mean_temp": dict(
+        inputs=[f"{SURFACE}/ParsedSurfaceTemp.csv", f"{SURFACE}/temp_country_year.csv"],
+        output=f"{SURFACE}/GlobalMeanTemp.csv",
+        build=build_global_mean_temp,
+    ),
+    "climate_spiral": dict(
+        inputs=[f"{SURFACE}/GLB.Ts+dSST.csv"],
+        output=f"{SURFACE}/coordinate_df.csv",
+        build=build_climate_spiral,
+    ),
+}
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def dependencies(name):
+    """Stages whose output is one of the inputs of ``name``."""
+    inputs = set(STAGES[name]["inputs"])
+    return [other for other, stage in STAGES.items() if stage["output"] in inputs]
+
+
+def plan(targets):
+    """``targets`` and everything they depend on, in dependency order."""
+    order = []
+
+    def visit(name, path=()):
+        if name in path:
+            raise ValueError(f"Dependency cycle: {' -> '.join(path + (name,))}")
+        if name in order:
+            return
+        for dependency in dependencies(name):
+            visit(dependency, path + (name,))
+        order.append(name)
+
+    for name in targets:
+        visit(name)
+    return order
+
+
+def fingerprint(name, datasets):
+    """Hashes of the stage's code and inputs, None when an input is missing."""
+    stage = STAGES[name]
+    paths = [datasets / path for path in stage["inputs"]]
+    if not all(path.exists() for path in paths):
+        return None
+    return {
+        "code": hashlib.sha256(inspect.getsource(stage["build"]).encode()).hexdigest(),
+        "inputs": {str(p): file_hash(datasets / p) for p in stage["inputs"]},
+    }
+
+
+def status(name, datasets, manifest):
+    output = datasets / STAGES[name]["output"]
+    current = fingerprint(name, datasets)
+    if current is None:
+        return "missing input" if not output.exists() else "source unavailable"
+    if not output.exists():
+        return "missing output"
+    if name not in manifest:
+        return "not built by the ETL"
+    if manifest.get(name) != current:
+        return "out of date"
+    return "up to date"
+
+
+def run(targets, datasets=DATASETS, force=False, dry_run=False):
+    """Build ``targets`` and what they depend on; returns the stages built."""
+    manifest_path = datasets / ".etl-manifest.json"
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+
+    built = []
+    for name in plan(targets):
+        stage = STAGES[name]
+        state = status(name, datasets, manifest)
+        if state == "missing input" and not dependencies(name):
+            # Nothing to build from yet, the later stages keep their artifacts
+            print(f"{name:<28} skipped, source unavailable")
+            continue
+        if state == "missing input":
+            missing = [p for p in stage["inputs"] if not (datasets / p).exists()]
+            raise FileNotFoundError(f"{name}: missing {', '.join(missing)}")
+        if state == "source unavailable":
+            print(f"{name:<28} kept, source unavailable")
+            continue
+        if state == "up to date" and not force:
+            print(f"{name:<28} up to date")
+            continue
+        if state == "not built by the ETL" and not force:
+            # Made by hand or by the notebooks, replacing it could lose work
+            print(f"{name:<28} kept, not built by the ETL (use --force)")
+            continue
+
+        print(f"{name:<28} {'would rebuild' if dry_run else 'rebuilding'} ({state})")
+        if dry_run:
+            continue
+        output = datasets / stage["output"]
+        # Write next to the output and rename, so readers never see half a file
+        partial = output.with_name(f".{output.stem}.partial{output.suffix}")
+        stage["build"](*[datasets / path for path in stage["inputs"]], partial)
+        partial.replace(output)
+
+        manifest[name] = fingerprint(name, datasets)
+        manifest_path.write_text(json.dumps(manifest, indent=2))
+        built.append(name)
+    return built
+
+
+def _read_tables(path):
+    if path.suffix == ".xlsx":
+        return pd.read_excel(path, sheet_name=None, index_col=0)
+    if path.suffix == ".npz":
+        with np.load(path) as saved:
+            return {
+                key: pd.DataFrame(saved[key].reshape(len(saved[key]), -1))
+                for key in saved.files
+            }
+    return {"": pd.read_csv(path, index_col=0)}
+
+
+def _tables(path):
+    # Every table of an artifact by name, labelled by its first column. A
+    # column without a header or any value, like the gap left between the
+    # pasted years of AnnualTempByCountry.xlsx, holds no data.
+    tables = _read_tables(path)
+    for name, table in tables.items():
+        blank = table.columns.astype(str).str.startswith("Unnamed:")
+        tables[name] = table.loc[:, ~(blank & table.isna().all().to_numpy())]
+    return tables
+
+
+def _labels(kind, old, new):
+    # Row or column labels only one of two tables has, a few of each
+    lines = []
+    for side, labels in (
+        ("missing", old.difference(new)),
+        ("extra", new.difference(old)),
+    ):
+        if len(labels):
+            shown = ", ".join(str(label) for label in labels[:5])
+            more = ", ..." if len(labels) > 5 else ""
+            lines.append(f"{len(labels)} {kind} {side}: {shown}{more}")
+    return lines
+
+
+def compare(expected, actual):
+    """Differences of the artifact ``actual`` from ``expected``, one per line."""
+    if not expected.exists():
+        return [f"{expected} does not exist"]
+    expected, actual = _tables(expected), _tables(actual)
+    lines = [f"sheet {name} missing" for name in expected if name not in actual]
+    lines += [f"sheet {name} extra" for name in actual if name not in expected]
+    for name in [name for name in expected if name in actual]:
+        old, new = expected[name], actual[name]
+        found = _labels("rows", old.index, new.index)
+        found += _labels("columns", old.columns, new.columns)
+        rows = old.index.intersection(new.index)
+        columns = old.columns.intersection(new.columns)
+        old, new = old.loc[rows, columns], new.loc[rows, columns]
+        numeric = old.select_dtypes("number").columns.intersection(
+            new.select_dtypes("number").columns
+        )
+        a, b = old[numeric].to_numpy(float), new[numeric].to_numpy(float)
+        nan = int((np.isnan(a) != np.isnan(b)).sum())
+        if nan:
+            found.append(f"{nan} cells missing in one but not the other")
+        with np.errstate(invalid="ignore"):
+            delta = np.nanmax(np.abs(a - b), initial=0)
+        if delta > TOLERANCE:
+            found.append(f"values differ by up to {delta:.6g}")
+        others = columns.difference(numeric)
+        unequal = int((old[others].astype(str) != new[others].astype(str)).sum().sum())
+        if unequal:
+            found.append(f"{unequal} other cells differ")
+        lines += [f"{name}: {line}" if name else line for line in found]
+    return lines
+
+
+def check(targets, datasets=DATASETS):
+    """
+    Rebuild ``targets`` in a scratch copy of ``datasets`` and compare each
+    stage built there with its artifact in ``datasets``. Returns the
+    differences by stage; stages whose sources are missing are left out.
+    """
+    paths = {path for stage in STAGES.values() for path in stage["inputs"]}
+    paths |= {stage["output"] for stage in STAGES.values()}
+    with tempfile.TemporaryDirectory() as scratch:
+        scratch = Path(scratch)
+        for path in paths:
+            if (datasets / path).exists():
+                (scratch / path).parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(datasets / path, scratch / path)
+        built = run(targets, scratch, force=True)
+        return {
+            name: compare(
+                datasets / STAGES[name]["output"], scratch / STAGES[name]["output"]
+            )
+            for name in built
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "stages", nargs="*", help="Stages to build (default: all)", metavar="stage"
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Rebuild up to date stages"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Only show what would run"
+    )
+    parser.add_argument("--list", action="store_true", help="List stages and exit")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Rebuild into a scratch copy and compare with the current artifacts",
+    )
+    parser.add_argument(
+        "--datasets", type=Path, default=DATASETS, help="Datasets directory"
+    )
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.stages if name not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    if args.list:
+        manifest_path = args.datasets / ".etl-manifest.json"
+        manifest = (
+            json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+        )
+        for name in plan(list(STAGES)):
+            after = ", ".join(dependencies(name)) or "-"
+            print(
+                f"{name:<28} {status(name, args.datasets, manifest):<22} after: {after}"
+            )
+        return 0
+
+    if args.check:
+        differences = check(args.stages or list(STAGES), args.datasets)
+        for name in plan(args.stages or list(STAGES)):
+            if name not in differences:
+                print(f"{name:<28} not checked, source unavailable")
+            elif not differences[name]:
+                print(f"{name:<28} matches")
+            for line in differences.get(name, []):
+                print(f"{name:<28} {line}")
+        return 1 if any(differences.values()) else 0
+
+    run(args.stages or list(STAGES), args.datasets, args.force, args.dry_run)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
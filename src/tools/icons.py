@@ -0,0 +1,165 @@
+"""
+Bundle the data of every DashIconify icon of the app into assets/icons.js.
+
+Run from the repository root:
+
+    python src/tools/icons.py                 # fetch the icons in use, write the bundle
+    python src/tools/icons.py --source DIR    # same, from @iconify-json packages
+    python src/tools/icons.py --check         # fail if the bundle is out of date
+
+DashIconify looks icons up in the browser's Iconify storage before asking
+the Iconify API, and the storage is filled from ``window.IconifyPreload``
+when the component loads. The bundle sets it for every icon found in the
+app shell and the page layouts, so navigation renders with no request
+outside the app. It is generated when the image is built (see the
+Dockerfile) and not kept in git.
+
+The icon data comes from the Iconify API, or with ``--source`` from the
+``<prefix>/icons.json`` files of a directory of ``@iconify-json``
+packages (e.g. ``node_modules/@iconify-json``). ``--check`` compares the
+bundle with that data, names and bodies, and fails on any difference.
+"""
+
+import argparse
+import json
+import sys
+import urllib.request
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+from tools.prerender import walk  # noqa: E402
+
+BUNDLE = Path(__file__).parents[1] / "assets" / "icons.js"
+API = "https://api.iconify.design"
+HEADER = """\
+// Icon data of every DashIconify icon in the layout, so the icons render
+// without asking the Iconify API. Regenerate with: python src/tools/icons.py
+window.IconifyPreload = """
+
+
+def icons_in_use():
+    """``{prefix: {name, ...}}`` of the DashIconify icons of every layout."""
+    import dash
+
+    from app import app
+
+    layouts = [app.layout]
+    for page in dash.page_registry.values():
+        layout = page["layout"]
+        layouts.append(layout() if callable(layout) else layout)
+
+    icons = defaultdict(set)
+    for component in walk(layouts):
+        if type(component).__name__ == "DashIconify":
+            prefix, name = component.icon.split(":", 1)
+            icons[prefix].add(name)
+    return icons
+
+
+def read_bundle(path=BUNDLE):
+    if not path.exists():
+        return []
+    text = path.read_text()
+    return json.loads(text[len(HEADER) :].rstrip().rstrip(";"))
+
+
+def write_bundle(collections, path=BUNDLE):
+    path.write_text(f"{HEADER}{json.dumps(collections, indent=2)};\n")
+
+
+def load_set(prefix, names, source=None):
+    """The IconifyJSON of the icon set ``prefix``, with at least ``names``."""
+    if source is not None:
+        return json.loads((source / prefix / "icons.json").read_text())
+    # One request per icon set, in the IconifyJSON format the bundle stores
+    url = f"{API}/{prefix}.json?icons={','.join(sorted(names))}"
+    with urllib.request.urlopen(url, timeout=30) as response:
+        return json.load(response)
+
+
+def subset(data, names):
+    """
+    The IconifyJSON of ``names`` out of the one of their whole set, with the
+    icons their aliases point to.
+    """
+    prefix = data["prefix"]
+    icons, aliases = {}, {}
+    pending = sorted(names)
+    while pending:
+        name = pending.pop()
+        if name in icons or name in aliases:
+            continue
+        if name in data.get("icons", {}):
+            icons[name] = data["icons"][name]
+        elif name in data.get("aliases", {}):
+            aliases[name] = data["aliases"][name]
+            pending.append(aliases[name]["parent"])
+        else:
+            raise ValueError(f"Unknown icon: {prefix}:{name}")
+    collection = dict(
+        prefix=prefix,
+        width=data.get("width", 16),
+        height=data.get("height", 16),
+        icons=dict(sorted(icons.items())),
+    )
+    if aliases:
+        collection["aliases"] = dict(sorted(aliases.items()))
+    return collection
+
+
+def build(used, source=None):
+    return [
+        subset(load_set(prefix, names, source), names)
+        for prefix, names in sorted(used.items())
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--check", action="store_true", help="Only check the bundle is up to date"
+    )
+    parser.add_argument(
+        "--source",
+        type=Path,
+        help="Directory of @iconify-json packages (default: the Iconify API)",
+    )
+    args = parser.parse_args(argv)
+
+    used = icons_in_use()
+    if not args.check:
+        write_bundle(build(used, args.source))
+        print(f"bundled {sum(map(len, used.values()))} icons into {BUNDLE}")
+        return 0
+
+    bundled = {c["prefix"]: c for c in read_bundle()}
+    missing = sorted(
+        f"{prefix}:{name}"
+        for prefix, names in used.items()
+        for name in names
+        - set(bundled.get(prefix, {}).get("icons", {}))
+        - set(bundled.get(prefix, {}).get("aliases", {}))
+    )
+    for icon in missing:
+        print(f"not bundled: {icon}")
+
+    # Icons with the right name but not the data of the Iconify set
+    differ = []
+    for expected in build(used, args.source):
+        actual = bundled.get(expected["prefix"], {})
+        for key in ("icons", "aliases"):
+            for name, entry in expected.get(key, {}).items():
+                if name in actual.get(key, {}) and actual[key][name] != entry:
+                    differ.append(f"{expected['prefix']}:{name}")
+        for key in ("width", "height"):
+            if actual and actual.get(key) != expected[key]:
+                differ.append(f"{expected['prefix']} ({key})")
+    for icon in differ:
+        print(f"differs from Iconify: {icon}")
+    return 1 if missing or differ else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
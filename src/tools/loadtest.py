@@ -0,0 +1,322 @@
+"""
+Replay realistic interaction traces against the ``_dash-update-component``
+endpoint and report per-callback latency.
+
+Run from the repository root:
+
+    python src/tools/loadtest.py                          # start the app in-process
+    python src/tools/loadtest.py --url http://localhost:5000
+    python src/tools/loadtest.py -c 8 -n 5 --trace surface_year_drag
+    python src/tools/loadtest.py --compare loadtest-baseline.json
+
+Each virtual user replays the selected traces ``--iterations`` times. A trace
+step changes one or more component properties; every callback of the trace
+whose inputs include a changed property is fired, exactly like the browser
+would do after the same interaction.
+"""
+
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+
+def _year_sweep(start, stop):
+    step = 1 if stop >= start else -1
+    return [{"year-slider.value": y} for y in range(start, stop + step, step)]
+
+
+def _country_churn():
+    selections = [
+        ["China", "United States", "India"],
+        ["China", "United States", "India", "Germany"],
+        ["China", "United States", "India", "Germany", "Japan"],
+        ["China", "India", "Germany", "Japan"],
+        ["China", "India", "Germany", "Japan", "Brazil", "Russia"],
+        ["India", "Brazil"],
+        ["India", "Brazil", "United Kingdom", "France", "Canada"],
+    ]
+    steps = [{"country-selector.value": s} for s in selections]
+    steps.append({"view-selector.value": "Chart View"})
+    steps.extend({"country-selector.value": s} for s in reversed(selections))
+    steps.append({"view-selector.value": "Map View"})
+    return steps
+
+
+TRACES = {
+    "surface_year_drag": {
+        "pathname": "/surface_temp_vis",
+        "outputs": [
+            "surface-temperature-plot.figure",
+            "max-temp.children",
+            "country-temp-plot.figure",
+            "global-temp-plot.figure",
+        ],
+        "initial": {
+            "year-slider.value": 2023,
+            "country-select.value": ["United States", "India", "China"],
+            "temperature-mode.value": "absolute",
+            "baseline-window.value": [1951, 1980],
+        },
+        "steps": _year_sweep(2023, 1950) + _year_sweep(1950, 2013),
+    },
+    "gdp_continent_switch": {
+        "pathname": "/gdp_vis",
+        "outputs": ["emm-gdp-graph.figure"],
+        "initial": {"continent-select.value": "World"},
+        "steps": [
+            {"continent-select.value": continent}
+            for continent in [
+                "Asia",
+                "Europe",
+                "Africa",
+                "South America",
+                "Oceania",
+                "North America",
+                "World",
+            ]
+        ],
+    },
+    "annual_co2_country_churn": {
+        "pathname": "/annual_co2_emission",
+        "outputs": ["view-container.children"],
+        "initial": {
+            "view-selector.value": "Map View",
+            "country-selector.value": ["China", "United States", "India"],
+        },
+        "steps": _country_churn(),
+    },
+}
+
+
+def _split_prop(prop):
+    component_id, _, prop_name = prop.rpartition(".")
+    return component_id, prop_name
+
+
+def _matches(dependency, output):
+    # Multi-output callbacks are encoded as "..a.figure...b.children.."
+    return output in dependency["output"].strip(".").split("...")
+
+
+class Client:
+    def __init__(self, base_url, timeout=60):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def get_json(self, path):
+        with urllib.request.urlopen(self.base_url + path, timeout=self.timeout) as r:
+            return json.loads(r.read())
+
+    def post_json(self, path, payload):
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=json.dumps(payload).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as r:
+            return r.status, len(r.read())
+
+
+def resolve_trace(trace, dependencies):
+    callbacks = [
+        dep
+        for dep in dependencies
+        if dep.get("clientside_function") is None
+        and any(_matches(dep, output) for output in trace["outputs"])
+    ]
+    missing = [
+        output
+        for output in trace["outputs"]
+        if not any(_matches(dep, output) for dep in callbacks)
+    ]
+    if missing:
+        raise ValueError(f"No callback found for outputs: {', '.join(missing)}")
+    return callbacks
+
+
+def build_payload(dependency, values, changed):
+    def props(items):
+        return [
+            {
+                "id": item["id"],
+                "property": item["property"],
+                "value": values.get(f"{item['id']}.{item['property']}"),
+            }
+            for item in items
+        ]
+
+    outputs = dependency["output"]
+    if outputs.startswith(".."):
+        output_spec = [
+            dict(zip(("id", "property"), _split_prop(o)))
+            for o in outputs.strip(".").split("...")
+        ]
+    else:
+        output_spec = dict(zip(("id", "property"), _split_prop(outputs)))
+
+    return {
+        "output": outputs,
+        "outputs": output_spec,
+        "inputs": props(dependency["inputs"]),
+        "state": props(dependency["state"]),
+        "changedPropIds": sorted(changed),
+    }
+
+
+def replay(client, name, trace, callbacks, iterations, samples):
+    values = dict(trace["initial"])
+    for _ in range(iterations):
+        for step in trace["steps"]:
+            values.update(step)
+            for dependency in callbacks:
+                inputs = {f"{i['id']}.{i['property']}" for i in dependency["inputs"]}
+                changed = inputs.intersection(step)
+                if not changed:
+                    continue
+                payload = build_payload(dependency, values, changed)
+                started = time.perf_counter()
+                try:
+                    status, size = client.post_json("/_dash-update-component", payload)
+                    error = status not in (200, 204)
+                except Exception:
+                    status, size, error = None, 0, True
+                samples[(name, dependency["output"])].append(
+                    (time.perf_counter() - started, size, error)
+                )
+
+
+def summarize(samples, wall_time):
+    results = []
+    for (trace, output), rows in sorted(samples.items()):
+        latencies = np.array([r[0] for r in rows]) * 1000
+        results.append(
+            {
+                "trace": trace,
+                "callback": output,
+                "requests": len(rows),
+                "errors": sum(r[2] for r in rows),
+                "throughput_rps": len(rows) / wall_time,
+                "mean_ms": float(latencies.mean()),
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p95_ms": float(np.percentile(latencies, 95)),
+                "p99_ms": float(np.percentile(latencies, 99)),
+                "mean_bytes": float(np.mean([r[1] for r in rows])),
+            }
+        )
+    return results
+
+
+def print_report(results, baseline=None):
+    previous = {}
+    if baseline is not None:
+        previous = {(r["trace"], r["callback"]): r for r in baseline["results"]}
+
+    header = f"{'trace / callback':<70} {'req':>6} {'err':>4} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        label = f"{r['trace']} / {r['callback']}"
+        if len(label) > 70:
+            label = label[:67] + "..."
+        line = (
+            f"{label:<70} {r['requests']:>6} {r['errors']:>4} "
+            f"{r['throughput_rps']:>8.1f} {r['p50_ms']:>7.1f}ms "
+            f"{r['p95_ms']:>7.1f}ms {r['p99_ms']:>7.1f}ms"
+        )
+        old = previous.get((r["trace"], r["callback"]))
+        if old is not None and old["p95_ms"] > 0:
+            line += f"  p95 {100 * (r['p95_ms'] / old['p95_ms'] - 1):+.1f}%"
+        print(line)
+
+
+def start_in_process():
+    from werkzeug.serving import make_server
+
+    from app import server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    httpd = make_server("127.0.0.1", 0, server, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, f"http://127.0.0.1:{httpd.server_port}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="Target a running server instead of starting one")
+    parser.add_argument("-c", "--concurrency", type=int, default=4)
+    parser.add_argument("-n", "--iterations", type=int, default=1)
+    parser.add_argument(
+        "--trace", action="append", choices=sorted(TRACES), help="Defaults to all"
+    )
+    parser.add_argument("--output", help="Where to save the results (JSON)")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    args = parser.parse_args(argv)
+
+    httpd = None
+    if args.url:
+        base_url = args.url
+    else:
+        httpd, base_url = start_in_process()
+
+    client = Client(base_url)
+    dependencies = client.get_json("/_dash-dependencies")
+    selected = {name: TRACES[name] for name in args.trace or sorted(TRACES)}
+    resolved = {
+        name: resolve_trace(trace, dependencies) for name, trace in selected.items()
+    }
+
+    samples = defaultdict(list)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [
+            pool.submit(
+                replay, client, name, trace, resolved[name], args.iterations, samples
+            )
+            for _ in range(args.concurrency)
+            for name, trace in selected.items()
+        ]
+        for future in futures:
+            future.result()
+    wall_time = time.perf_counter() - started
+
+    if httpd is not None:
+        httpd.shutdown()
+
+    results = summarize(samples, wall_time)
+    baseline = None
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+    print_report(results, baseline)
+
+    output = args.output or f"loadtest-{datetime.now():%Y%m%d-%H%M%S}.json"
+    Path(output).write_text(
+        json.dumps(
+            {
+                "target": args.url or "in-process",
+                "concurrency": args.concurrency,
+                "iterations": args.iterations,
+                "wall_time_s": wall_time,
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+    print(f"\nSaved results to {output}")
+
+
+if __name__ == "__main__":
+    main()
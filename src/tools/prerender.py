@@ -0,0 +1,389 @@
+"""
+Prerender the app into a static snapshot that any static file server can host.
+
+Run from the repository root:
+
+    python src/tools/prerender.py build                   # writes snapshot/
+    python src/tools/prerender.py build -k year-slider    # only matching inputs
+    python src/tools/prerender.py serve snapshot --port 8050
+
+``build`` saves the page HTML, the layout, the callback graph and the
+scripts and styles the browser loads, then fires every server callback once
+for every value of each discrete control among its inputs (years of a
+slider, options of a select, pages of the router, ...), the other inputs
+keeping their initial values. Every response is stored gzipped under
+``_snapshot/`` with an index from the callback inputs to the file; for
+callbacks that branch on what triggered them, the index also tells the
+changed input.
+
+In the snapshot, ``assets/snapshot.js`` answers the app's requests from
+those files instead of the server, and a state that was not prerendered
+leaves its outputs as they are. ``serve`` is a minimal static server that
+sends the gzipped responses with the right encoding; nginx with
+``gzip_static`` or ``python -m http.server`` work as well.
+"""
+
+import argparse
+import gzip
+import inspect
+import itertools
+import json
+import re
+import shutil
+import sys
+import time
+from pathlib import Path
+
+from plotly.utils import PlotlyJSONEncoder
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+from tools.loadtest import build_payload  # noqa: E402
+
+SNAPSHOT = "_snapshot"
+PAGES_LOCATION = "_pages_location"
+# Past this many options a control keeps its initial value only
+MAX_VALUES = 400
+
+
+def _normalize(value):
+    # Values as the browser sends them back: plain JSON, no numpy types
+    return json.loads(json.dumps(value, cls=PlotlyJSONEncoder))
+
+
+def _canonical(value):
+    # JSON.stringify writes 2000.0 as 2000
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, list):
+        return [_canonical(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _canonical(item) for key, item in value.items()}
+    return value
+
+
+def state_key(dependency, payload, trigger=False):
+    """
+    The key of a callback request in the snapshot index: its output and the
+    values of its inputs and state, then with ``trigger`` the changed props,
+    as compact JSON with sorted keys, computed the same way by
+    ``assets/snapshot.js``.
+    """
+    key = [
+        dependency["output"],
+        [item.get("value") for item in payload["inputs"]],
+        [item.get("value") for item in payload["state"]],
+    ]
+    if trigger:
+        key.append(sorted(payload["changedPropIds"]))
+    return json.dumps(
+        _canonical(key),
+        separators=(",", ":"),
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+
+
+def reads_trigger(app, dependency):
+    """
+    Whether the callback of ``dependency`` looks at what triggered it
+    (``ctx.triggered_id`` and the like), so the same values can give
+    different responses.
+    """
+    callback = app.callback_map.get(dependency["output"], {}).get("callback")
+    if callback is None:
+        return False
+    try:
+        source = inspect.getsource(inspect.unwrap(callback))
+    except (OSError, TypeError):
+        # Without the source, keying on the trigger is the safe choice
+        return True
+    return "triggered" in source
+
+
+def walk(component):
+    """Every Dash component nested anywhere in the props of ``component``."""
+    if isinstance(component, (list, tuple)):
+        for item in component:
+            yield from walk(item)
+    elif hasattr(component, "_prop_names"):
+        yield component
+        for prop in component._prop_names:
+            yield from walk(getattr(component, prop, None))
+
+
+def _options(items):
+    values = []
+    for item in [] if items is None else items:
+        if isinstance(item, dict):
+            values.append(item.get("value"))
+        elif hasattr(item, "_prop_names"):
+            values.append(getattr(item, "value", None))
+        else:
+            values.append(item)
+    return values
+
+
+def domain(component, prop):
+    """The values a control can take for ``prop``, None if not enumerable."""
+    kind = type(component).__name__
+    if prop == "n_clicks" and "lazy-graph-trigger" in str(
+        getattr(component, "className", "")
+    ):
+        # lib.lazy_graph clicks its trigger once
+        return [1]
+    if prop in ("checked",):
+        return [True, False]
+    if prop != "value":
+        return None
+    if kind in ("Slider", "NumberInput"):
+        low, high = getattr(component, "min", None), getattr(component, "max", None)
+        step = getattr(component, "step", None) or 1
+        if low is None or high is None:
+            return None
+        values = list(range(int(low), int(high) + 1, int(step)))
+    elif kind in ("Select", "SegmentedControl", "RadioItems", "Chips"):
+        items = getattr(component, "data", None)
+        values = _options(
+            getattr(component, "options", None) if items is None else items
+        )
+    elif kind == "Dropdown" and not getattr(component, "multi", False):
+        values = _options(getattr(component, "options", None))
+    elif kind == "RadioGroup":
+        values = [
+            getattr(radio, "value", None)
+            for radio in walk(getattr(component, "children", None))
+            if type(radio).__name__ == "Radio"
+        ]
+    else:
+        return None
+    return values if len(values) <= MAX_VALUES else None
+
+
+def collect_controls(app):
+    """
+    ``{(id, prop): (initial value, domain)}`` for the components of the app
+    shell and every page. Ids reused by several pages get the union of
+    their domains.
+    """
+    import dash
+
+    layouts = [app.layout]
+    for page in dash.page_registry.values():
+        layout = page["layout"]
+        layouts.append(layout() if callable(layout) else layout)
+
+    controls = {}
+    for component in walk(layouts):
+        component_id = getattr(component, "id", None)
+        if not isinstance(component_id, str):
+            continue
+        for prop in component._prop_names:
+            initial = _normalize(getattr(component, prop, None))
+            values = domain(component, prop)
+            key = (component_id, prop)
+            if key in controls:
+                old_initial, old_values = controls[key]
+                if values is not None and old_values is not None:
+                    values = old_values + [v for v in values if v not in old_values]
+                initial = old_initial
+            controls[key] = (initial, _normalize(values))
+
+    paths = ["/"] + [page["path"] for page in dash.page_registry.values()]
+    # Static servers redirect /page to /page/
+    paths += [f"{path}/" for path in paths if path != "/"]
+    controls[(PAGES_LOCATION, "pathname")] = ("/", paths)
+    controls[(PAGES_LOCATION, "search")] = ("", None)
+    return controls
+
+
+def states(dependency, controls, trigger=False):
+    """
+    Values of every callback prop for each state to prerender: the initial
+    state, then each input in turn through its domain. With ``trigger``,
+    the same values changed by different inputs are different states.
+    """
+    props = dependency["inputs"] + dependency["state"]
+    initial = {}
+    for item in props:
+        key = (item["id"], item["property"])
+        initial[key] = controls.get(key, (None, None))[0]
+
+    seen = set()
+    for item in [None, *dependency["inputs"]]:
+        if item is None:
+            candidates, changed = [None], None
+        else:
+            changed = (item["id"], item["property"])
+            candidates = controls.get(changed, (None, None))[1]
+            if candidates is None:
+                # Not enumerable; with ``trigger`` its initial value still
+                # responds differently once it was moved back there
+                candidates = [initial[changed]] if trigger else []
+        for value in candidates:
+            values = dict(initial)
+            if changed is not None:
+                values[changed] = value
+            marker = json.dumps(
+                [sorted(values.items(), key=str), changed if trigger else None],
+                default=str,
+            )
+            if marker in seen:
+                continue
+            seen.add(marker)
+            yield {f"{i}.{p}": v for (i, p), v in values.items()}, changed
+
+
+def _save(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+def copy_resources(app, client, html, output):
+    """Save the scripts and styles of the page and the lazily loaded chunks."""
+    from dash.development.base_component import ComponentRegistry
+
+    urls = set(re.findall(r'(?:src|href)="(/[^"?]+)', html))
+    for namespace in ComponentRegistry.registry:
+        module = sys.modules.get(namespace)
+        for entry in getattr(module, "_js_dist", []) + getattr(module, "_css_dist", []):
+            relative = entry.get("relative_package_path")
+            for path in relative if isinstance(relative, list) else [relative]:
+                # Source maps are only served in debug mode
+                if path and not path.endswith(".map"):
+                    urls.add(f"/_dash-component-suites/{entry['namespace']}/{path}")
+
+    # Assets fetched by scripts rather than the page, like the map topojson
+    assets = Path(app.config.assets_folder)
+    for path in assets.rglob("*"):
+        if path.is_file() and path.suffix != ".py" and "__pycache__" not in path.parts:
+            urls.add(app.get_asset_url(path.relative_to(assets).as_posix()))
+
+    saved = 0
+    for url in sorted(urls):
+        response = client.get(url)
+        if response.status_code == 200:
+            _save(output / url.lstrip("/"), response.get_data())
+            saved += 1
+    return saved
+
+
+def build(output, keyword=None):
+    from app import app
+
+    client = app.server.test_client()
+    output.mkdir(parents=True, exist_ok=True)
+    snapshot = output / SNAPSHOT
+
+    html = client.get("/").get_data(as_text=True)
+    html = html.replace(
+        "<head>", f'<head>\n<meta name="dash-snapshot" content="/{SNAPSHOT}">', 1
+    )
+    import dash
+
+    for page in dash.page_registry.values():
+        _save(output / page["path"].strip("/") / "index.html", html.encode())
+    _save(output / "index.html", html.encode())
+    _save(snapshot / "layout.json", client.get("/_dash-layout").get_data())
+    dependencies = client.get("/_dash-dependencies").json
+    _save(snapshot / "dependencies.json", json.dumps(dependencies).encode())
+    print(f"resources: {copy_resources(app, client, html, output)} files")
+
+    controls = collect_controls(app)
+    index, counter = {}, itertools.count()
+    for number, dependency in enumerate(dependencies):
+        if dependency.get("clientside_function") is not None:
+            continue
+        if keyword and not any(
+            keyword in f"{i['id']}.{i['property']}" for i in dependency["inputs"]
+        ):
+            continue
+
+        directory = f"cb{number}"
+        trigger = reads_trigger(app, dependency)
+        entries, failed, started = {}, 0, time.perf_counter()
+        for values, changed in states(dependency, controls, trigger):
+            changed = [f"{changed[0]}.{changed[1]}"] if changed else []
+            payload = build_payload(dependency, values, changed)
+            response = client.post("/_dash-update-component", json=payload)
+            if response.status_code == 204:
+                continue
+            if response.status_code != 200:
+                failed += 1
+                continue
+            name = f"s{next(counter)}.json.gz"
+            _save(snapshot / directory / name, gzip.compress(response.get_data(), 9))
+            entries[state_key(dependency, payload, trigger)] = name
+
+        if entries:
+            index[dependency["output"]] = dict(directory=directory, trigger=trigger)
+            _save(
+                snapshot / directory / "index.json",
+                json.dumps(entries, ensure_ascii=False).encode(),
+            )
+        print(
+            f"{dependency['output'][:70]:<72} {len(entries):>5} states"
+            f" {failed:>4} failed {time.perf_counter() - started:8.1f}s"
+        )
+
+    _save(snapshot / "index.json", json.dumps(index, ensure_ascii=False).encode())
+
+
+def serve(directory, host, port):
+    from flask import Flask, abort, send_file
+
+    server = Flask(__name__)
+    root = directory.resolve()
+
+    @server.route("/", defaults={"path": ""})
+    @server.route("/<path:path>")
+    def static_file(path):
+        target = (root / path).resolve()
+        if root not in target.parents and target != root:
+            abort(404)
+        if target.is_dir():
+            target = target / "index.html"
+        if not target.is_file():
+            abort(404)
+        if target.name.endswith(".json.gz"):
+            response = send_file(target, mimetype="application/json")
+            response.headers["Content-Encoding"] = "gzip"
+            return response
+        return send_file(target)
+
+    server.run(host=host, port=port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", help="Prerender the snapshot")
+    build_parser.add_argument(
+        "--output", type=Path, default=Path("snapshot"), help="Output directory"
+    )
+    build_parser.add_argument(
+        "-k", help="Only callbacks with an input containing this text"
+    )
+
+    serve_parser = commands.add_parser("serve", help="Serve a snapshot")
+    serve_parser.add_argument("directory", type=Path, nargs="?", default="snapshot")
+    serve_parser.add_argument("--host", default="0.0.0.0")
+    serve_parser.add_argument("--port", type=int, default=8050)
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        if args.output.exists():
+            # Only ever replace an earlier snapshot, never another directory
+            built = (args.output / SNAPSHOT / "index.json").is_file()
+            if not args.output.is_dir() or (any(args.output.iterdir()) and not built):
+                parser.error(f"{args.output} exists and is not a snapshot")
+            shutil.rmtree(args.output)
+        build(args.output, args.k)
+    else:
+        serve(args.directory, args.host, args.port)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
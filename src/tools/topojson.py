@@ -0,0 +1,128 @@
+"""
+Build the world topojson the maps load from the app's assets, at every level
+of detail of ``lib.geo.LEVELS``.
+
+Run from the repository root:
+
+    python src/tools/topojson.py                        # download from the Plotly CDN
+    python src/tools/topojson.py --source ~/topojson    # world_110m.json, world_50m.json
+    python src/tools/topojson.py --list                 # levels and their sizes
+
+Every level is built from one of the files plotly.js ships on its CDN and
+written to ``assets/topojson/<level>/world_110m.json``, the name plotly.js
+requests for the default map resolution. Levels with a tolerance have
+every arc simplified with Douglas-Peucker; arcs are shared by neighbouring
+countries in topojson, so borders stay seamless. Rings that would collapse
+keep their points, so no country disappears.
+"""
+
+import argparse
+import json
+import sys
+import urllib.request
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+from lib.geo import LEVELS, TOPOJSON, TOPOJSON_NAME  # noqa: E402
+
+CDN = "https://cdn.plot.ly/"
+
+
+def simplify(points, tolerance):
+    """Indices of the points of a line kept by Douglas-Peucker."""
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a, b = points[start], points[end]
+        inner = points[start + 1 : end] - a
+        dx, dy = b - a
+        length = np.hypot(dx, dy)
+        if length:
+            distance = np.abs(dx * inner[:, 1] - dy * inner[:, 0]) / length
+        else:  # a closed ring
+            distance = np.hypot(inner[:, 0], inner[:, 1])
+        farthest = int(np.argmax(distance))
+        if distance[farthest] > tolerance:
+            middle = start + 1 + farthest
+            keep[middle] = True
+            stack += [(start, middle), (middle, end)]
+    return np.flatnonzero(keep)
+
+
+def simplify_topology(topology, tolerance):
+    """A copy of ``topology`` with every arc simplified, coordinates kept."""
+    transform = topology.get("transform")
+    arcs = []
+    for arc in topology["arcs"]:
+        positions = np.asarray(arc, dtype=float)
+        if transform:
+            # Quantized and delta-encoded: absolute integers, then degrees
+            positions = np.cumsum(positions, axis=0)
+            points = positions * transform["scale"] + transform["translate"]
+        else:
+            points = positions
+        kept = (
+            simplify(points, tolerance) if len(points) > 2 else np.arange(len(points))
+        )
+        closed = len(points) > 3 and np.array_equal(points[0], points[-1])
+        if closed and len(kept) < 4:
+            kept = np.arange(len(points))
+        positions = positions[kept]
+        if transform:
+            positions = np.diff(positions, axis=0, prepend=[[0, 0]]).astype(int)
+        arcs.append(positions.tolist())
+    return {**topology, "arcs": arcs}
+
+
+def load_source(name, source=None):
+    if source is not None:
+        return json.loads((source / f"{name}.json").read_text())
+    with urllib.request.urlopen(f"{CDN}{name}.json", timeout=60) as response:
+        return json.load(response)
+
+
+def build(source=None, output=TOPOJSON):
+    sources = {}
+    for level, spec in LEVELS.items():
+        if spec["source"] not in sources:
+            sources[spec["source"]] = load_source(spec["source"], source)
+        topology = sources[spec["source"]]
+        if spec["tolerance"]:
+            topology = simplify_topology(topology, spec["tolerance"])
+        path = output / level / TOPOJSON_NAME
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(topology, separators=(",", ":")))
+        points = sum(len(arc) for arc in topology["arcs"])
+        print(f"{level:<8} {points:>8} points {path.stat().st_size / 1024:>8.0f} KiB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--source",
+        type=Path,
+        help="Directory with the Plotly topojson files (default: download them)",
+    )
+    parser.add_argument("--list", action="store_true", help="List levels and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for level, spec in LEVELS.items():
+            path = TOPOJSON / level / TOPOJSON_NAME
+            size = f"{path.stat().st_size / 1024:.0f} KiB" if path.exists() else "-"
+            print(f"{level:<8} {spec['source']:<12} {size:>10}")
+        return 0
+
+    build(args.source)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
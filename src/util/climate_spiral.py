@@ -3,15 +3,15 @@ import numpy as np
 import plotly.graph_objects as go
 from pathlib import Path
 from assets.constants import months
+from util.snapshot import cached, register
 
-coordinate_df = (
+anomaly_path = (
     Path(__file__).parents[2]
     / "Datasets"
     / "Surface Temperatures"
-    / "coordinate_df.csv"
+    / "GlobalTempAnomaly.csv"
 )
 
-coordinate_df = pd.read_csv(coordinate_df)
 TEMP_MAX, TEMP_MIN = (1.48, -0.81)
 
 
@@ -19,16 +19,60 @@ def temp_to_r(temp, min_=TEMP_MIN, max_=TEMP_MAX, scale=10):
     return scale * (temp - min_) / (max_ - min_)
 
 
-def create_climate_spiral(year):
+@cached("climate_spiral", maxsize=None)
+def load_monthly_anomaly(path=anomaly_path):
+    """Returns ``(years, months, anomaly)`` arrays of a monthly anomaly table."""
+    df = pd.read_csv(path, usecols=["Time", "Anomaly (deg C)"], dtype={"Time": str})
+    # Time is always "YYYY-MM", slicing is much cheaper than pd.to_datetime
+    years = df["Time"].str.slice(0, 4).astype(int).to_numpy()
+    months = df["Time"].str.slice(5, 7).astype(int).to_numpy()
+    return years, months, df["Anomaly (deg C)"].to_numpy(dtype=float)
+
+
+@cached("climate_spiral", maxsize=32)
+def spiral_coordinates(
+    start=1880,
+    end=None,
+    temp_min=TEMP_MIN,
+    temp_max=TEMP_MAX,
+    scale=10,
+    path=anomaly_path,
+):
+    """
+    Coordinates of the climate spiral for the years ``start``–``end``
+    (inclusive, defaults to the last year of the table): one row per month
+    with its angle ``radian``, the year as ``z`` and the anomaly mapped to the
+    radius as in Climate_Spiral.ipynb.
+    """
+    years, month, anomaly = load_monthly_anomaly(path)
+    end = years[-1] if end is None else end
+    window = (years >= start) & (years <= end)
+
+    theta = np.radians((month[window] - 1) * 30)
+    r = temp_to_r(anomaly[window] - temp_min, temp_min, temp_max, scale)
+    coordinates = pd.DataFrame(
+        {
+            "x": r * np.cos(theta),
+            "y": r * np.sin(theta),
+            "z": years[window],
+            "radian": theta,
+        }
+    )
+    return coordinates.sort_values(["z", "radian"], ignore_index=True)
+
+
+def create_climate_spiral(year, start=1880):
+    coordinates = spiral_coordinates(start)
+    coordinates = coordinates[coordinates["z"] < year]
     fig = go.Figure(
         data=[
             go.Scatter3d(
-                x=coordinate_df[coordinate_df["z"] < year]["x"],
-                y=coordinate_df[coordinate_df["z"] < year]["y"],
-                z=coordinate_df[coordinate_df["z"] < year]["z"],
+                x=coordinates["x"],
+                y=coordinates["y"],
+                z=coordinates["z"],
                 mode="lines",
                 line=dict(
-                    color=coordinate_df[
+                    color=coordinates[
                         "z"
                     ],  # You can specify a different column for colors
                     colorscale="Turbo",
@@ -143,3 +187,6 @@ def create_climate_spiral(year):
     )
 
     return fig
+
+
+register("climate_spiral", [anomaly_path], warm=[load_monthly_anomaly])
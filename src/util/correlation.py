@@ -0,0 +1,214 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from util.snapshot import cached, register
+
+datasets = Path(__file__).parents[2] / "Datasets"
+
+# Wide tables holding one column per year for each of the two series. "x" and
+# "y" map a year to the name of its column.
+PAIRS = {
+    "co2_population": dict(
+        path=datasets / "Correlation Data" / "correlation - co2 vs population.csv",
+        x=lambda year: f"Annual CO₂ emissions growth (%)_{year}",
+        y=lambda year: f"Population Growth %_{year}",
+    ),
+    "temperature_population": dict(
+        path=datasets / "Correlation Data" / "correlation_temperature.csv",
+        x=lambda year: f"Population Growth %_{year}",
+        y=lambda year: str(year),
+    ),
+    "emissions_gdp": dict(
+        path=datasets / "GDP" / "Correlation - Emissions vs GDP.xlsx",
+        sheet_name="Calculation-Country",
+        x=lambda year: f"{year}_x",
+        y=lambda year: f"{year}_y",
+    ),
+    "gdp_temperature": dict(
+        path=datasets / "GDP" / "Correlation - GDP vs Temp.xlsx",
+        sheet_name="Calculation-Method 2",
+        x=lambda year: year,
+        y=lambda year: f"{year}.1",
+    ),
+}
+
+
+def _read(spec):
+    if spec["path"].suffix == ".xlsx":
+        return pd.read_excel(spec["path"], sheet_name=spec["sheet_name"])
+    return pd.read_csv(spec["path"])
+
+
+@cached("correlation", maxsize=None)
+def load_pair(name):
+    """
+    Returns ``(entities, years, x, y)`` for one of the PAIRS: the country (and
+    continent, when known) of every row and two ``countries × years`` float
+    matrices with NaN for missing values.
+    """
+    spec = PAIRS[name]
+    df = _read(spec)
+    years = np.array(
+        [
+            year
+            for year in range(1750, 2100)
+            if spec["x"](year) in df.columns and spec["y"](year) in df.columns
+        ]
+    )
+
+    def matrix(column):
+        block = df[[column(year) for year in years]]
+        return block.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+
+    entities = df[[c for c in ("Country", "Continent") if c in df.columns]]
+    return entities.reset_index(drop=True), years, matrix(spec["x"]), matrix(spec["y"])
+
+
+def pearson(x, y, min_periods=3):
+    """Row-wise Pearson correlation over the years where both x and y exist."""
+    valid = ~(np.isnan(x) | np.isnan(y))
+    n = valid.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_x = np.where(valid, x, 0).sum(axis=1) / n
+        mean_y = np.where(valid, y, 0).sum(axis=1) / n
+        dx = np.where(valid, x - mean_x[:, None], 0)
+        dy = np.where(valid, y - mean_y[:, None], 0)
+        r = (dx * dy).sum(axis=1) / np.sqrt(
+            (dx * dx).sum(axis=1) * (dy * dy).sum(axis=1)
+        )
+    r[n < min_periods] = np.nan
+    return r
+
+
+def rank(values):
+    """Row-wise average ranks (1-based); NaN stays NaN."""
+    order = np.argsort(values, axis=1, kind="stable")
+    ordered = np.take_along_axis(values, order, axis=1)
+    positions = np.broadcast_to(np.arange(values.shape[1]), values.shape)
+
+    # A run of ties spans [first, last]; every member gets their mean rank.
+    starts = np.ones(values.shape, dtype=bool)
+    starts[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    ends = np.ones(values.shape, dtype=bool)
+    ends[:, :-1] = ordered[:, :-1] != ordered[:, 1:]
+    first = np.maximum.accumulate(np.where(starts, positions, 0), axis=1)
+    last = np.minimum.accumulate(
+        np.where(ends, positions, values.shape[1])[:, ::-1], axis=1
+    )[:, ::-1]
+
+    ranks = np.empty(values.shape)
+    np.put_along_axis(ranks, order, (first + last) / 2 + 1, axis=1)
+    ranks[np.isnan(values)] = np.nan
+    return ranks
+
+
+def spearman(x, y, min_periods=3):
+    """Row-wise Spearman correlation over the years where both x and y exist."""
+    valid = ~(np.isnan(x) | np.isnan(y))
+    return pearson(
+        rank(np.where(valid, x, np.nan)),
+        rank(np.where(valid, y, np.nan)),
+        min_periods,
+    )
+
+
+METHODS = {"pearson": pearson, "spearman": spearman}
+
+
+@cached("correlation", maxsize=256)
+def correlation(name, start=None, end=None, method="pearson"):
+    """
+    Correlation of every country of a PAIRS table over the years
+    ``start``–``end`` (inclusive, defaults to the whole table), as a frame
+    with the country, its continent when known and a "Correlation" column.
+    Countries with fewer than three common years are dropped.
+    """
+    entities, years, x, y = load_pair(name)
+    start = years[0] if start is None else start
+    end = years[-1] if end is None else end
+    window = (years >= start) & (years <= end)
+
+    result = entities.copy()
+    result["Correlation"] = METHODS[method](x[:, window], y[:, window])
+    return result.dropna(subset=["Correlation"]).reset_index(drop=True)
+
+
+def year_range(name):
+    years = load_pair(name)[1]
+    return int(years[0]), int(years[-1])
+
+
+# Variances below this fraction of the sum of squares are rounding noise
+VARIANCE_EPS = 1e-10
+
+
+def _pearson_from_sums(n, sx, sy, sxx, syy, sxy, min_periods=3, peaks=None):
+    # Running sums carry the rounding error of every value they once held:
+    # ``peaks`` are the largest sums of squares they reached
+    peak_xx, peak_yy = (sxx, syy) if peaks is None else peaks
+    var_x = n * sxx - sx * sx
+    var_y = n * syy - sy * sy
+    with np.errstate(invalid="ignore", divide="ignore"):
+        r = (n * sxy - sx * sy) / np.sqrt(var_x * var_y)
+    # A constant series has no correlation, not the one of its rounding noise
+    constant = (var_x <= VARIANCE_EPS * n * peak_xx) | (
+        var_y <= VARIANCE_EPS * n * peak_yy
+    )
+    r[(n < min_periods) | constant] = np.nan
+    return np.clip(r, -1, 1)
+
+
+@cached("correlation", maxsize=32)
+def rolling_correlation(name, length, min_periods=3):
+    """
+    Pearson correlation of every country over each window of ``length``
+    consecutive years. Returns ``(ends, r)`` where ``r[:, i]`` is the
+    correlation over the window ending in ``ends[i]``.
+
+    The six sums behind Pearson's r are kept as running totals, so sliding the
+    window by one year adds the entering year and subtracts the leaving one
+    for all countries at once.
+    """
+    entities, years, x, y = load_pair(name)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    x0 = np.where(valid, x, 0)
+    y0 = np.where(valid, y, 0)
+    terms = np.stack([valid, x0, y0, x0 * x0, y0 * y0, x0 * y0]).astype(float)
+
+    ends = years[length - 1 :]
+    r = np.empty((len(entities), len(ends)))
+    sums = np.zeros(terms.shape[:2])
+    peaks = np.zeros((2, len(entities)))
+    for t in range(len(years)):
+        sums += terms[:, :, t]
+        peaks = np.maximum(peaks, sums[3:5])
+        if t >= length:
+            sums -= terms[:, :, t - length]
+        if t >= length - 1:
+            r[:, t - length + 1] = _pearson_from_sums(*sums, min_periods, peaks)
+    return ends, r
+
+
+def rolling_frame(name, length, end):
+    """
+    The rolling correlation of the window ending in ``end``, as a frame;
+    empty when no full window ends in that year.
+    """
+    entities = load_pair(name)[0]
+    ends, r = rolling_correlation(name, length)
+    result = entities.copy()
+    column = np.searchsorted(ends, end)
+    if column < len(ends) and ends[column] == end:
+        result["Correlation"] = r[:, column]
+    else:
+        result["Correlation"] = np.nan
+    return result.dropna(subset=["Correlation"]).reset_index(drop=True)
+
+
+register(
+    "correlation",
+    [spec["path"] for spec in PAIRS.values()],
+    warm=[lambda: [load_pair(name) for name in PAIRS]],
+)
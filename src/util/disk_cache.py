@@ -0,0 +1,212 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Code every page depends on: a change here invalidates every entry
+SHARED_SOURCES = [Path(__file__).parent, Path(__file__).parents[1] / "lib"]
+
+_store = None
+
+# Reads only move an entry up the LRU order once it was last read this many
+# seconds ago, and the moves are written in batches, so hits rarely write
+ACCESS_RESOLUTION = 60.0
+ACCESS_BATCH = 256
+
+
+class DiskCache:
+    """
+    LRU cache of bytes in a SQLite file. Every process and thread opening the
+    same path shares the entries, which outlive restarts; once the values
+    exceed ``max_bytes`` the least recently read ones are evicted.
+
+    Errors of the database (locked for too long, disk full) are logged and
+    treated as misses: the cache never fails a request.
+
+    Hits only take the write lock to record their access time once every
+    ``ACCESS_BATCH`` stale reads (see ``ACCESS_RESOLUTION``), and the total
+    size is kept in the ``meta`` table rather than summed on every write.
+    """
+
+    def __init__(self, path, max_bytes=256 << 20):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        # Access times read but not written yet, by key
+        self._accessed = {}
+        self._accessed_lock = threading.Lock()
+        db = self._connect()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY,"
+            " value INTEGER NOT NULL)"
+        )
+        db.execute(
+            "INSERT OR IGNORE INTO meta"
+            " SELECT 'size', COALESCE(SUM(size), 0) FROM entries"
+        )
+
+    def _connect(self):
+        # Connections can be shared neither by threads nor across a fork
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            # Readers never wait for the writer
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def get(self, key):
+        try:
+            db = self._connect()
+            row = db.execute(
+                "SELECT value, accessed FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[1] > ACCESS_RESOLUTION:
+                with self._accessed_lock:
+                    self._accessed[key] = now
+                    full = len(self._accessed) >= ACCESS_BATCH
+                if full:
+                    db.execute("BEGIN IMMEDIATE")
+                    try:
+                        self._write_accessed(db)
+                        db.execute("COMMIT")
+                    except BaseException:
+                        db.execute("ROLLBACK")
+                        raise
+            return row[0]
+        except sqlite3.Error:
+            logger.warning("Reading %s from %s failed", key, self.path, exc_info=True)
+            return None
+
+    def _write_accessed(self, db):
+        with self._accessed_lock:
+            accessed, self._accessed = self._accessed, {}
+        db.executemany(
+            "UPDATE entries SET accessed = ? WHERE key = ?",
+            [(when, key) for key, when in accessed.items()],
+        )
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        try:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                # Evict by the latest access times, now that the lock is held
+                self._write_accessed(db)
+                replaced = db.execute(
+                    "SELECT size FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                db.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                    (key, value, len(value), time.time()),
+                )
+                total = self.size(db) + len(value) - (replaced[0] if replaced else 0)
+                victims = []
+                if total > self.max_bytes:
+                    for old, size in db.execute(
+                        "SELECT key, size FROM entries ORDER BY accessed"
+                    ):
+                        if total <= self.max_bytes:
+                            break
+                        victims.append((old,))
+                        total -= size
+                db.executemany("DELETE FROM entries WHERE key = ?", victims)
+                db.execute("UPDATE meta SET value = ? WHERE name = 'size'", (total,))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            logger.warning("Writing %s to %s failed", key, self.path, exc_info=True)
+
+    def size(self, db=None):
+        """Total size of the values, in bytes."""
+        db = db or self._connect()
+        return db.execute("SELECT value FROM meta WHERE name = 'size'").fetchone()[0]
+
+    def clear(self):
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        db.execute("DELETE FROM entries")
+        db.execute("UPDATE meta SET value = 0 WHERE name = 'size'")
+        db.execute("COMMIT")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+def open_store(path, max_bytes=256 << 20):
+    """
+    Open the store shared by ``util.snapshot.cached(persist=True)`` and the
+    callback cache; before this call, nothing is persisted.
+    """
+    global _store
+    _store = DiskCache(path, max_bytes)
+    return _store
+
+
+def store():
+    return _store
+
+
+def close_store():
+    """Stop persisting; what the store holds stays on disk."""
+    global _store
+    _store = None
+
+
+def files_digest(paths):
+    """Hash of the content of ``paths``, missing files included."""
+    digest = hashlib.sha256()
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+        except FileNotFoundError:
+            digest.update(b"missing")
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def make_key(*parts):
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def source_digest(*modules):
+    """
+    Hash of the source of ``modules`` and of the shared ``util`` and ``lib``
+    packages: entries computed by code that changed are never read again,
+    while a deploy leaves the others warm.
+    """
+    files = [
+        Path(getattr(sys.modules.get(module), "__file__", None) or os.devnull)
+        for module in modules
+    ]
+    for directory in SHARED_SOURCES:
+        files += sorted(directory.glob("*.py"))
+    digest = hashlib.sha256()
+    for path in files:
+        if path.is_file():
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
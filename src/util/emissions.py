@@ -0,0 +1,397 @@
+import inspect
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from util.snapshot import appended, cached, register
+
+datasets = Path(__file__).parents[2] / "Datasets"
+
+# Long tables with one row per entity and year, each providing one metric of
+# the cube.
+METRICS = {
+    "annual": dict(
+        path=datasets
+        / "annual_co2_emissions_by_country"
+        / "annual-co2-emissions-per-country.csv",
+        column="Annual CO₂ emissions",
+    ),
+    "per_capita": dict(
+        path=datasets / "CO2_Emissions" / "co-emissions-per-capita.csv",
+        column="Annual CO₂ emissions (per capita)",
+    ),
+}
+
+# Metrics computed from the annual emissions rather than read from a table
+DERIVED = {
+    "share": "Share of global annual CO₂ emissions (%)",
+    "growth": "Annual CO₂ emissions growth (%)",
+    "cumulative": "Cumulative CO₂ emissions",
+}
+
+# Aggregates published next to the countries in the tables above, by level of
+# the region hierarchy.
+REGIONS = {
+    "World": ["World"],
+    "Continent": [
+        "Africa",
+        "Asia",
+        "Europe",
+        "North America",
+        "Oceania",
+        "South America",
+    ],
+    "Income group": [
+        "High-income countries",
+        "Upper-middle-income countries",
+        "Lower-middle-income countries",
+        "Low-income countries",
+    ],
+}
+
+
+@cached("emissions", maxsize=None)
+def load_cube():
+    """
+    Returns ``(entities, codes, years, cube)`` where ``cube[e, y, m]`` is the
+    value of the ``m``-th of the METRICS for ``entities[e]`` in ``years[y]``,
+    NaN when missing.
+    """
+    frames = []
+    for m, spec in enumerate(METRICS.values()):
+        df = pd.read_csv(spec["path"])
+        frames.append(
+            pd.DataFrame(
+                {
+                    "Entity": df["Entity"],
+                    "Code": df["Code"],
+                    "Year": df["Year"],
+                    "metric": m,
+                    "value": df[spec["column"]],
+                }
+            )
+        )
+    long = pd.concat(frames, ignore_index=True).dropna(subset=["Entity"])
+
+    entity_codes, entities = pd.factorize(long["Entity"], sort=True)
+    year = long["Year"].to_numpy()
+    years = np.arange(year.min(), year.max() + 1)
+    cube = np.full((len(entities), len(years), len(METRICS)), np.nan)
+    cube[entity_codes, year - years[0], long["metric"].to_numpy()] = long["value"]
+
+    codes = long.groupby("Entity")["Code"].first().reindex(entities).to_numpy()
+    return entities.to_numpy(), codes, years, cube
+
+
+@cached("emissions", maxsize=None)
+def entity_index():
+    """Maps every entity name to its row in the cube."""
+    return {entity: i for i, entity in enumerate(load_cube()[0])}
+
+
+@cached("emissions", maxsize=None)
+def is_country():
+    """Boolean mask of the cube rows that are countries rather than aggregates."""
+    codes = load_cube()[1]
+    # Aggregates have no ISO code, or an OWID_ one, except Kosovo
+    return np.array(
+        [isinstance(c, str) and (len(c) == 3 or c == "OWID_KOS") for c in codes]
+    )
+
+
+def countries():
+    return load_cube()[0][is_country()]
+
+
+def year_range():
+    years = load_cube()[2]
+    return int(years[0]), int(years[-1])
+
+
+def _year_window(years, start, end):
+    start = years[0] if start is None else start
+    end = years[-1] if end is None else end
+    return slice(
+        np.searchsorted(years, start), np.searchsorted(years, end, side="right")
+    )
+
+
+def label(metric):
+    if metric in METRICS:
+        return METRICS[metric]["column"]
+    return DERIVED[metric]
+
+
+@cached("emissions", maxsize=None)
+def values(metric):
+    """``entities × years`` matrix of one of the METRICS or DERIVED metrics."""
+    if metric in METRICS:
+        return load_cube()[3][:, :, list(METRICS).index(metric)]
+
+    annual = values("annual")
+    if metric == "cumulative":
+        result = prefix_sums("annual")[:, 1:].copy()
+        # Nothing emitted yet is missing rather than zero
+        result[np.isnan(np.fmax.accumulate(annual, axis=1))] = np.nan
+        return result
+
+    if metric == "growth":
+        return growth()
+
+    result = _share(annual, annual[entity_index()["World"]])
+    result[~np.isfinite(result)] = np.nan
+    return result
+
+
+@cached("emissions", maxsize=32)
+def growth(window=1, smoothing=1):
+    """
+    Compound annual growth rate, in %, of the emissions of every entity over
+    the ``window`` years ending in each year (year-on-year growth for 1), as
+    an ``entities × years`` matrix. With ``smoothing`` above 1 every value is
+    the mean of the last ``smoothing`` rates, and missing unless all exist.
+    """
+    return _growth(values("annual"), window, smoothing)
+
+
+def _growth(annual, window, smoothing):
+    result = np.full(annual.shape, np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = annual[:, window:] / annual[:, :-window]
+        result[:, window:] = 100 * (ratio ** (1 / window) - 1)
+    # Growth from zero emissions is undefined rather than infinite
+    result[~np.isfinite(result)] = np.nan
+
+    if smoothing > 1:
+        present = ~np.isnan(result)
+        sums = np.zeros((result.shape[0], result.shape[1] + 1))
+        counts = np.zeros(sums.shape, dtype=int)
+        np.cumsum(np.where(present, result, 0), axis=1, out=sums[:, 1:])
+        np.cumsum(present, axis=1, out=counts[:, 1:])
+        result = np.full(result.shape, np.nan)
+        complete = counts[:, smoothing:] - counts[:, :-smoothing] == smoothing
+        result[:, smoothing - 1 :] = np.where(
+            complete, (sums[:, smoothing:] - sums[:, :-smoothing]) / smoothing, np.nan
+        )
+    return result
+
+
+@cached("emissions", maxsize=None)
+def prefix_sums(metric):
+    """
+    Running totals of a metric over the years, with a leading column of
+    zeros: the sum over ``years[i:j]`` is ``sums[:, j] - sums[:, i]`` for
+    every entity at once. Missing values count as zero.
+    """
+    matrix = values(metric)
+    sums = np.zeros((matrix.shape[0], matrix.shape[1] + 1))
+    np.nancumsum(matrix, axis=1, out=sums[:, 1:])
+    return sums
+
+
+def range_total(metric="annual", start=None, end=None):
+    """Total of every entity over the years ``start``–``end``, from two lookups."""
+    window = _year_window(load_cube()[2], start, end)
+    sums = prefix_sums(metric)
+    return sums[:, window.stop] - sums[:, window.start]
+
+
+def _share(emissions, total):
+    # One broadcast divide of every row by the yearly total
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return 100 * emissions / total
+
+
+def select(entities, metric="annual", start=None, end=None):
+    """
+    Returns ``(years, values)`` with ``values`` as ``entities × years`` for
+    the years ``start``–``end`` (inclusive, defaults to the whole cube).
+    Unknown entities get a row of NaN.
+    """
+    years = load_cube()[2]
+    window = _year_window(years, start, end)
+    index = entity_index()
+    rows = np.array([index.get(entity, -1) for entity in entities], dtype=int)
+
+    selected = values(metric)[rows, window]
+    selected[rows < 0] = np.nan
+    return years[window], selected
+
+
+def series(entity, metric="annual", start=None, end=None):
+    """Returns ``(years, values)`` of a single entity."""
+    years, selected = select([entity], metric, start, end)
+    return years, selected[0]
+
+
+@cached("emissions", maxsize=None)
+def rollups(level, metric="annual"):
+    """
+    Returns ``(regions, values)``, the published aggregates of one level of
+    REGIONS as ``regions × years`` over the whole cube.
+    """
+    regions = REGIONS[level]
+    return regions, select(regions, metric)[1]
+
+
+def share(entities, denominator="World", start=None, end=None):
+    """
+    Returns ``(years, shares)``: the annual emissions of ``entities`` in % of
+    those of ``denominator``, as ``entities × years``. The denominator is any
+    entity of the cube (the World, a continent, ...) or None for the total of
+    ``entities`` themselves.
+    """
+    years, emissions = select(entities, "annual", start, end)
+    if denominator is None:
+        total = np.nansum(emissions, axis=0)
+    else:
+        total = series(denominator, "annual", start, end)[1]
+    shares = _share(emissions, total)
+    shares[~np.isfinite(shares)] = np.nan
+    return years, shares
+
+
+@cached("emissions", maxsize=32)
+def growth_frame(window=1, smoothing=1):
+    """``growth`` of every entity as a long frame with Entity, Code and Year."""
+    entities, codes, years, _ = load_cube()
+    frame = pd.DataFrame(
+        {
+            "Entity": np.repeat(entities, len(years)),
+            "Code": np.repeat(codes, len(years)),
+            "Year": np.tile(years, len(entities)),
+            label("growth"): growth(window, smoothing).ravel(),
+        }
+    )
+    return frame.dropna(subset=[label("growth")]).reset_index(drop=True)
+
+
+def select_frame(entities, metric="annual", start=None, end=None):
+    """``select`` as a long frame with Entity, Year and the metric, without gaps."""
+    years, selected = select(entities, metric, start, end)
+    frame = pd.DataFrame(
+        {
+            "Entity": np.repeat(list(entities), len(years)),
+            "Year": np.tile(years, len(entities)),
+            label(metric): selected.ravel(),
+        }
+    )
+    return frame.dropna().reset_index(drop=True)
+
+
+def select_chunks(entities, metric="annual", start=None, end=None, chunk_size=64):
+    """``select_frame`` of ``chunk_size`` entities at a time, for streaming."""
+    entities = list(entities)
+    for i in range(0, len(entities), chunk_size):
+        yield select_frame(entities[i : i + chunk_size], metric, start, end)
+
+
+@cached("emissions", maxsize=None)
+def rank_table(metric):
+    """
+    Returns ``(names, country_values, order)`` for the countries of the cube:
+    ``order[:, y]`` lists the rows of ``country_values`` from the highest to
+    the lowest value in ``years[y]``, with missing values last.
+    """
+    rows = np.flatnonzero(is_country())
+    country_values = values(metric)[rows]
+    # NaN sorts last, so negating gives a descending order with gaps at the end
+    order = np.argsort(-country_values, axis=0, kind="stable")
+    return load_cube()[0][rows], country_values, order
+
+
+def top_k(metric, year, k):
+    """Returns ``(names, values)`` of the ``k`` highest countries in ``year``."""
+    names, country_values, order = rank_table(metric)
+    column = year - load_cube()[2][0]
+    rows = order[:k, column]
+    top = country_values[rows, column]
+    present = ~np.isnan(top)
+    return names[rows[present]], top[present]
+
+
+def top_k_range(metric, start, end, k):
+    """Returns ``(names, totals)`` of the ``k`` highest totals over ``start``–``end``."""
+    names = countries()
+    totals = range_total(metric, start, end)[is_country()]
+    # Only the k largest need ordering
+    k = min(k, len(totals))
+    rows = np.argpartition(-totals, k - 1)[:k]
+    rows = rows[np.argsort(-totals[rows], kind="stable")]
+    return names[rows], totals[rows]
+
+
+def _append_years(previous):
+    """
+    Extend the results cached for the ``previous`` snapshot by the years the
+    tables gained, when that is all that changed: only the new columns of
+    the derived metrics, prefix sums, growth rates and rank tables are
+    computed, in O(entities) per year instead of O(entities × years).
+    """
+    old = load_cube.results(previous)
+    if not old:
+        return False
+    entities, codes, years, cube = old[0][2]
+    new_entities, new_codes, new_years, new_cube = load_cube()
+    if (
+        not np.array_equal(entities, new_entities)
+        or not pd.Series(codes).equals(pd.Series(new_codes))
+        or not appended(years, cube, new_years, new_cube)
+    ):
+        return False
+    n = len(years)
+
+    for args, kwargs, sums in prefix_sums.results(previous):
+        tail = np.nancumsum(values(*args, **kwargs)[:, n:], axis=1)
+        prefix_sums.prime(
+            np.concatenate([sums, sums[:, -1:] + tail], axis=1), *args, **kwargs
+        )
+
+    annual = values("annual")
+    for args, kwargs, growth_rates in growth.results(previous):
+        bound = inspect.signature(growth).bind(*args, **kwargs)
+        bound.apply_defaults()
+        window, smoothing = bound.args
+        # The first new rate needs the ``window + smoothing - 1`` years before it
+        start = max(0, n - window - smoothing + 1)
+        tail = _growth(annual[:, start:], window, smoothing)[:, n - start :]
+        growth.prime(np.concatenate([growth_rates, tail], axis=1), *args, **kwargs)
+
+    for args, kwargs, result in values.results(previous):
+        metric = args[0] if args else kwargs["metric"]
+        if metric in METRICS:
+            continue
+        if metric == "growth":
+            tail = growth()[:, n:]
+        elif metric == "cumulative":
+            tail = prefix_sums("annual")[:, n + 1 :].copy()
+            # Nothing emitted yet is missing rather than zero
+            seen = ~np.isnan(result[:, -1:]) | (
+                np.cumsum(~np.isnan(annual[:, n:]), axis=1) > 0
+            )
+            tail[~seen] = np.nan
+        else:
+            tail = _share(annual[:, n:], annual[entity_index()["World"], n:])
+            tail[~np.isfinite(tail)] = np.nan
+        values.prime(np.concatenate([result, tail], axis=1), *args, **kwargs)
+
+    rows = np.flatnonzero(is_country())
+    for args, kwargs, (names, _, order) in rank_table.results(previous):
+        country_values = values(*args, **kwargs)[rows]
+        tail = np.argsort(-country_values[:, n:], axis=0, kind="stable")
+        rank_table.prime(
+            (names, country_values, np.concatenate([order, tail], axis=1)),
+            *args,
+            **kwargs,
+        )
+    return True
+
+
+# Reloaded as one group whenever any of the tables changes
+register(
+    "emissions",
+    [spec["path"] for spec in METRICS.values()],
+    warm=[load_cube, entity_index],
+    append=_append_years,
+)
@@ -0,0 +1,396 @@
+import json
+import logging
+import threading
+from collections import OrderedDict
+from functools import wraps
+from pathlib import Path
+
+import numpy as np
+import plotly.graph_objects as go
+
+from util import disk_cache
+
+logger = logging.getLogger(__name__)
+
+# Dataset groups by name: the files each one is read from, the loaders that
+# build its in-memory structures, called when a new version is prepared, and
+# optionally a function extending the previous version when the files only
+# gained years.
+GROUPS = {}
+
+# Every function decorated with ``cached``, with the groups it depends on
+_caches = []
+
+_local = threading.local()
+_lock = threading.Lock()
+# Guards ``_current`` and the pin counts; never held while loading
+_pins_lock = threading.Lock()
+
+
+class Snapshot:
+    """
+    One consistent version of every dataset group: ``versions`` maps each
+    group to a counter bumped whenever one of its files changes, ``stamps``
+    to the ``(mtime, size)`` of its files that version was built from and
+    ``digests`` to the hash of their content, the same in every process.
+    """
+
+    def __init__(self, version=0, versions=None, stamps=None, digests=None):
+        self.version = version
+        self.versions = versions or {}
+        self.stamps = stamps or {}
+        self.digests = digests or {}
+        # Threads pinned to this snapshot, see ``pin``
+        self.pins = 0
+
+    def key(self, groups):
+        return tuple(self.versions.get(group, 0) for group in groups)
+
+
+_current = Snapshot()
+
+
+def _stamp(paths):
+    stamps = []
+    for path in paths:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            stamps.append(None)
+        else:
+            stamps.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(stamps)
+
+
+def register(group, paths, warm=(), append=None):
+    """
+    Declare a dataset group read from ``paths`` and warmed by ``warm``.
+
+    ``append``, if given, is called with the previous snapshot when the files
+    changed and may extend that snapshot's results with ``prime`` instead of
+    having them recomputed; it returns False when the change was more than
+    new years, and the group is then loaded from scratch.
+    """
+    GROUPS[group] = dict(paths=list(paths), warm=list(warm), append=append)
+    _current.stamps.setdefault(group, _stamp(GROUPS[group]["paths"]))
+    _current.digests.setdefault(group, disk_cache.files_digest(GROUPS[group]["paths"]))
+
+
+def current():
+    """The snapshot pinned to this thread, else the latest one."""
+    return getattr(_local, "snapshot", None) or _current
+
+
+def pin(snapshot=None):
+    """
+    Make every cached lookup of this thread use ``snapshot`` (the latest by
+    default) until ``release``, so a request started before a reload ends on
+    the data it started with.
+    """
+    with _pins_lock:
+        snapshot = snapshot or _current
+        snapshot.pins += 1
+    _local.snapshot = snapshot
+    _local.used = set()
+
+
+def release():
+    """Unpin this thread; returns the groups its lookups depended on."""
+    snapshot = getattr(_local, "snapshot", None)
+    used = getattr(_local, "used", None) or set()
+    _local.snapshot = _local.used = None
+    if snapshot is not None:
+        with _pins_lock:
+            snapshot.pins -= 1
+            retired = snapshot is not _current and not snapshot.pins
+        if retired:
+            _evict(snapshot)
+    return used
+
+
+def _evict(snapshot):
+    # Drop the cached results of ``snapshot`` that are not also the latest
+    for groups, func in _caches:
+        if snapshot.key(groups) != _current.key(groups):
+            func.evict(snapshot.key(groups))
+
+
+def used_versions():
+    """``{group: version}`` of the groups this thread has read since ``pin``."""
+    snapshot = current()
+    used = getattr(_local, "used", None) or ()
+    return {group: snapshot.versions.get(group, 0) for group in sorted(used)}
+
+
+def is_current(versions):
+    """Whether ``versions``, from ``used_versions``, are still the latest."""
+    return all(_current.versions.get(group, 0) == v for group, v in versions.items())
+
+
+def used_digests():
+    """
+    ``{group: digest}`` of the groups this thread has read since ``pin``; unlike
+    versions, valid in other processes and after a restart.
+    """
+    snapshot = current()
+    used = getattr(_local, "used", None) or ()
+    return {group: snapshot.digests.get(group) for group in sorted(used)}
+
+
+def is_current_digest(digests):
+    """Whether ``digests``, from ``used_digests``, are still the latest."""
+    return all(_current.digests.get(group) == d for group, d in digests.items())
+
+
+def files_key(root):
+    """
+    Key of the files under ``root``: the digests of the dataset groups and the
+    ``(mtime, size)`` of the files outside them, so only the groups' files
+    are read.
+    """
+    grouped = {
+        Path(path).resolve() for spec in GROUPS.values() for path in spec["paths"]
+    }
+    others = []
+    for path in sorted(Path(root).rglob("*.*")):
+        if path.resolve() not in grouped:
+            stat = path.stat()
+            others.append(
+                (path.relative_to(root).as_posix(), stat.st_mtime_ns, stat.st_size)
+            )
+    return disk_cache.make_key(sorted(_current.digests.items()), others)
+
+
+def _dumps(value):
+    # Figures, alone or in a tuple, as the JSON plotly writes them
+    if isinstance(value, go.Figure):
+        return f'{{"figure":{value.to_json()}}}'.encode()
+    if isinstance(value, tuple) and all(isinstance(v, go.Figure) for v in value):
+        return f'{{"figures":[{",".join(v.to_json() for v in value)}]}}'.encode()
+    raise TypeError(f"Cannot persist {type(value).__name__}, only figures")
+
+
+def _loads(data):
+    saved = json.loads(data)
+    if "figure" in saved:
+        return go.Figure(saved["figure"])
+    return tuple(go.Figure(figure) for figure in saved["figures"])
+
+
+def appended(years, values, new_years, new_values):
+    """
+    Number of years ``new_values`` (rows × years × ...) adds after the end of
+    ``values``, 0 unless every earlier year is unchanged.
+    """
+    n = len(years)
+    if (
+        len(new_years) <= n
+        or new_values.shape[0] != values.shape[0]
+        or not np.array_equal(new_years[:n], years)
+        or not np.array_equal(new_values[:, :n], values, equal_nan=True)
+    ):
+        return 0
+    return len(new_years) - n
+
+
+def cached(*groups, maxsize=128, persist=False):
+    """
+    ``functools.lru_cache`` for functions of the data in ``groups``: results
+    are keyed by the versions of those groups in the current snapshot as
+    well as by the arguments, so a reload never serves stale results and
+    results of unrelated groups stay cached.
+
+    With ``persist``, results missing in memory are also looked up in the
+    store of ``util.disk_cache`` when one is open, keyed by the content of
+    the groups' files and the function's source instead of the versions,
+    so other workers and later deploys reuse them. Arguments must have a
+    stable ``repr`` and results must be plotly figures or tuples of them,
+    stored as JSON.
+
+    ``results(snapshot)`` lists the ``(args, kwargs, value)`` cached for an
+    older snapshot and ``prime(value, *args, **kwargs)`` stores a value for
+    the current one, so a reload can extend results instead of recomputing.
+    """
+
+    def decorate(func):
+        entries = OrderedDict()
+        lock = threading.Lock()
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        def disk_key(args, kwargs):
+            snapshot = current()
+            return disk_cache.make_key(
+                name,
+                disk_cache.source_digest(func.__module__),
+                [snapshot.digests.get(group) for group in groups],
+                args,
+                sorted(kwargs.items()),
+            )
+
+        def compute(args, kwargs):
+            store = disk_cache.store() if persist else None
+            if store is None:
+                return func(*args, **kwargs)
+            key = disk_key(args, kwargs)
+            data = store.get(key)
+            if data is not None:
+                try:
+                    return _loads(data)
+                except (ValueError, KeyError, TypeError):
+                    logger.warning("Ignoring the unreadable %s entry %s", name, key)
+            value = func(*args, **kwargs)
+            store.put(key, _dumps(value))
+            return value
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            used = getattr(_local, "used", None)
+            if used is not None:
+                used.update(groups)
+            key = (current().key(groups), args, tuple(sorted(kwargs.items())))
+            with lock:
+                if key in entries:
+                    entries.move_to_end(key)
+                    return entries[key]
+            value = compute(args, kwargs)
+            with lock:
+                entries[key] = value
+                while maxsize is not None and len(entries) > maxsize:
+                    entries.popitem(last=False)
+            return value
+
+        def results(snapshot):
+            versions = snapshot.key(groups)
+            with lock:
+                return [
+                    (args, dict(kwargs), value)
+                    for (key, args, kwargs), value in entries.items()
+                    if key == versions
+                ]
+
+        def prime(value, *args, **kwargs):
+            key = (current().key(groups), args, tuple(sorted(kwargs.items())))
+            with lock:
+                entries[key] = value
+
+        def evict(versions):
+            with lock:
+                for key in [key for key in entries if key[0] == versions]:
+                    del entries[key]
+
+        def cache_clear():
+            with lock:
+                entries.clear()
+
+        wrapper.results = results
+        wrapper.prime = prime
+        wrapper.evict = evict
+        wrapper.cache_clear = cache_clear
+        _caches.append((groups, wrapper))
+        return wrapper
+
+    return decorate
+
+
+def clear_caches(keep=()):
+    """
+    Empty every ``cached`` function, except for the results in ``keep``, from
+    ``loaded``.
+    """
+    for _, func in _caches:
+        func.cache_clear()
+    for func, results in keep:
+        for args, kwargs, value in results:
+            func.prime(value, *args, **kwargs)
+
+
+def loaded():
+    """
+    The results cached by the loaders of every group and nothing else, as
+    right after a reload, for ``clear_caches`` to keep.
+    """
+    clear_caches()
+    for spec in GROUPS.values():
+        for loader in spec["warm"]:
+            loader()
+    return [(func, func.results(current())) for _, func in _caches]
+
+
+def changed_groups(snapshot=None):
+    """Groups whose files differ from the ones ``snapshot`` was built from."""
+    snapshot = snapshot or _current
+    return [
+        group
+        for group, spec in GROUPS.items()
+        if _stamp(spec["paths"]) != snapshot.stamps.get(group)
+    ]
+
+
+def reload(groups=None):
+    """
+    Build a new snapshot with ``groups`` (default: the changed ones) at a new
+    version, warm their loaders while requests keep using the current one,
+    then swap it in. The results of the old version are dropped once the
+    last request pinned to it is done. A group registered with ``append``
+    first tries to extend the results of the old version.
+
+    If a loader fails (e.g. a file is still being written) the current
+    snapshot stays and the groups are retried on the next call.
+    """
+    global _current
+
+    with _lock:
+        groups = changed_groups() if groups is None else list(groups)
+        if not groups:
+            return _current
+
+        stamps = dict(_current.stamps)
+        versions = dict(_current.versions)
+        digests = dict(_current.digests)
+        for group in groups:
+            stamps[group] = _stamp(GROUPS[group]["paths"])
+            versions[group] = versions.get(group, 0) + 1
+            digests[group] = disk_cache.files_digest(GROUPS[group]["paths"])
+        candidate = Snapshot(_current.version + 1, versions, stamps, digests)
+
+        previous = getattr(_local, "snapshot", None)
+        _local.snapshot = candidate
+        try:
+            for group in groups:
+                append = GROUPS[group]["append"]
+                if append is not None and append(_current):
+                    logger.info("Appended new years to %s", group)
+                    continue
+                for warm in GROUPS[group]["warm"]:
+                    warm()
+        except Exception:
+            logger.exception(
+                "Reloading %s failed, keeping version %d",
+                ", ".join(groups),
+                _current.version,
+            )
+            _evict(candidate)
+            return _current
+        finally:
+            _local.snapshot = previous
+
+        # A single assignment: a lookup sees either snapshot, never a mix
+        with _pins_lock:
+            retired, _current = _current, candidate
+            retired = None if retired.pins else retired
+    if retired is not None:
+        _evict(retired)
+    logger.info("Reloaded %s as version %d", ", ".join(groups), candidate.version)
+    return candidate
+
+
+def watch(interval=10.0):
+    """Reload changed groups every ``interval`` seconds from a daemon thread."""
+
+    def loop():
+        while not stop.wait(interval):
+            reload()
+
+    stop = threading.Event()
+    threading.Thread(target=loop, name="dataset-watcher", daemon=True).start()
+    return stop
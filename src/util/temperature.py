@@ -0,0 +1,208 @@
+import inspect
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from util.snapshot import appended, cached, register
+
+surface_temperatures = Path(__file__).parents[2] / "Datasets" / "Surface Temperatures"
+annual_path = surface_temperatures / "AnnualTempByCountry.xlsx"
+monthly_path = surface_temperatures / "GlobalLandTemperaturesByCountry.csv"
+monthly_cube_path = surface_temperatures / "MonthlyTempByCountry.npz"
+
+DEFAULT_BASELINE = (1951, 1980)
+
+
+@cached("temperature", maxsize=None)
+def load_annual():
+    """Mean annual temperature per country, one column per year."""
+    return pd.read_excel(annual_path, sheet_name="Complete")
+
+
+@cached("temperature", maxsize=None)
+def annual_matrix():
+    """Returns ``(countries, years, values)`` with values as countries × years."""
+    df = load_annual()
+    years = np.array([c for c in df.columns if isinstance(c, int)])
+    return df["Country"].to_numpy(), years, df[years].to_numpy(dtype=float)
+
+
+def _grow(cube, first_year, rows, start, end, fill=np.nan):
+    # Copy the cube into one covering ``rows`` countries and ``start``–``end``
+    grown = np.full((rows, end - start + 1) + cube.shape[2:], fill, cube.dtype)
+    offset = first_year - start
+    grown[: cube.shape[0], offset : offset + cube.shape[1]] = cube
+    return grown
+
+
+def ingest_monthly(raw=monthly_path, output=monthly_cube_path, chunksize=100_000):
+    """
+    Stream the raw Berkeley Earth table into the monthly cube and the annual
+    means per country, and save both to ``output``.
+
+    The table is read ``chunksize`` rows at a time and every chunk is written
+    straight into the result, so besides the result itself only one chunk is
+    ever held in memory: about 15 MB with the default 100k rows, against
+    some 80 MB for the whole 577k-row table. A table without any dated
+    country row gives empty arrays.
+    """
+    index = {}
+    cube = np.full((0, 0, 12), np.nan, dtype=np.float32)
+    sums = np.zeros((0, 0))
+    counts = np.zeros((0, 0), dtype=np.int16)
+    first_year = last_year = None
+
+    for chunk in pd.read_csv(
+        raw,
+        usecols=["dt", "AverageTemperature", "Country"],
+        dtype={"dt": str, "AverageTemperature": float, "Country": str},
+        chunksize=chunksize,
+    ):
+        chunk = chunk.dropna(subset=["dt", "Country"])
+        if chunk.empty:
+            continue
+        # dt is always "YYYY-MM-DD", slicing is much cheaper than pd.to_datetime
+        year = chunk["dt"].str.slice(0, 4).astype(int).to_numpy()
+        month = chunk["dt"].str.slice(5, 7).astype(int).to_numpy() - 1
+        codes, names = pd.factorize(chunk["Country"])
+        for name in names:
+            index.setdefault(name, len(index))
+        rows = np.array([index[name] for name in names], dtype=int)[codes]
+
+        start = year.min() if first_year is None else min(first_year, year.min())
+        end = year.max() if last_year is None else max(last_year, year.max())
+        if (start, end, len(index)) != (first_year, last_year, len(cube)):
+            first_year = start if first_year is None else first_year
+            cube = _grow(cube, first_year, len(index), start, end)
+            sums = _grow(sums, first_year, len(index), start, end, fill=0)
+            counts = _grow(counts, first_year, len(index), start, end, fill=0)
+            first_year, last_year = start, end
+
+        value = chunk["AverageTemperature"].to_numpy()
+        cube[rows, year - first_year, month] = value
+        present = ~np.isnan(value)
+        np.add.at(sums, (rows[present], year[present] - first_year), value[present])
+        np.add.at(counts, (rows[present], year[present] - first_year), 1)
+
+    order = np.argsort(list(index))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        annual = sums / counts
+    years = (
+        np.arange(first_year, last_year + 1)
+        if first_year is not None
+        else np.array([], dtype=int)
+    )
+    np.savez_compressed(
+        output,
+        countries=np.array(list(index), dtype=str)[order],
+        years=years,
+        cube=cube[order],
+        annual=annual[order],
+    )
+
+
+@cached("temperature", maxsize=None)
+def country_index():
+    """Maps every country name to its row in ``annual_matrix``."""
+    return {country: i for i, country in enumerate(annual_matrix()[0])}
+
+
+def year_range():
+    years = annual_matrix()[1]
+    return int(years[0]), int(years[-1])
+
+
+@cached("temperature", maxsize=None)
+def monthly_cube():
+    """
+    Returns ``(countries, years, cube)`` where ``cube[c, y, m]`` is the mean
+    temperature of country ``c`` in month ``m + 1`` of ``years[y]``.
+
+    Reads the cube saved by ``ingest_monthly``, which the ETL builds from
+    the raw table (``tools/etl.py monthly_temp_cube``); requests never read
+    the raw table. Without the cube, every array is empty.
+    """
+    if not monthly_cube_path.exists():
+        return (
+            np.array([], dtype=str),
+            np.array([], dtype=int),
+            np.empty((0, 0, 12)),
+        )
+    with np.load(monthly_cube_path) as saved:
+        return saved["countries"], saved["years"], saved["cube"].astype(float)
+
+
+def _baseline_mean(values, years, start, end):
+    # Mean over the baseline years along axis 1, ignoring missing values
+    window = (years >= start) & (years <= end)
+    with warnings.catch_warnings():
+        # Countries without data in the baseline get NaN
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return np.nanmean(values[:, window], axis=1, keepdims=True)
+
+
+@cached("temperature", maxsize=32)
+def annual_anomaly(start=DEFAULT_BASELINE[0], end=DEFAULT_BASELINE[1]):
+    """
+    Annual temperature of every country minus its mean over the baseline
+    years ``start``–``end``, as a countries × years matrix.
+    """
+    _, years, values = annual_matrix()
+    return values - _baseline_mean(values, years, start, end)
+
+
+@cached("temperature", maxsize=32)
+def monthly_anomaly(start=DEFAULT_BASELINE[0], end=DEFAULT_BASELINE[1]):
+    """
+    Monthly temperature of every country minus the mean of the same calendar
+    month over the baseline years, as a countries × years × 12 cube.
+    """
+    _, years, cube = monthly_cube()
+    return cube - _baseline_mean(cube, years, start, end)
+
+
+def _append_years(previous):
+    """
+    Carry the anomalies cached for the ``previous`` snapshot over to the new
+    one, computing only the years the tables gained, when that is all that
+    changed. Baselines reaching into the new years are left to recompute.
+    """
+    for loader, anomaly in (
+        (annual_matrix, annual_anomaly),
+        (monthly_cube, monthly_anomaly),
+    ):
+        old = loader.results(previous)
+        if not old:
+            continue
+        countries, years, values = old[0][2]
+        new_countries, new_years, new_values = loader()
+        if not np.array_equal(countries, new_countries):
+            return False
+        unchanged = np.array_equal(years, new_years) and np.array_equal(
+            values, new_values, equal_nan=True
+        )
+        if not unchanged and not appended(years, values, new_years, new_values):
+            return False
+
+        n = len(years)
+        for args, kwargs, result in anomaly.results(previous):
+            bound = inspect.signature(anomaly).bind(*args, **kwargs)
+            bound.apply_defaults()
+            start, end = bound.args
+            if not unchanged:
+                if not len(years) or end > years[-1]:
+                    continue
+                baseline = _baseline_mean(new_values, new_years, start, end)
+                result = np.concatenate([result, new_values[:, n:] - baseline], axis=1)
+            anomaly.prime(result, *args, **kwargs)
+    return True
+
+
+register(
+    "temperature",
+    [annual_path, monthly_cube_path],
+    warm=[annual_matrix, monthly_cube],
+    append=_append_years,
+)
@@ -0,0 +1,171 @@
+from functools import wraps
+
+import numpy as np
+import pandas as pd
+
+from util import emissions, temperature
+from util.snapshot import cached
+
+
+def _emissions_matrix(metric):
+    names, _, years, _ = emissions.load_cube()
+    return names, years, emissions.values(metric)
+
+
+# Dense entity × year matrices the trends are fitted to: the dataset group
+# each is read from and a function returning ``(names, years, values)``.
+SERIES = {
+    "annual": dict(group="emissions", matrix=lambda: _emissions_matrix("annual")),
+    "per_capita": dict(
+        group="emissions", matrix=lambda: _emissions_matrix("per_capita")
+    ),
+    "temperature": dict(group="temperature", matrix=temperature.annual_matrix),
+}
+
+
+def _cached_by_series(maxsize):
+    """
+    ``cached`` on the group of the series a function is called with, so a
+    reload of one dataset keeps the trends fitted to the others.
+    """
+
+    def decorate(func):
+        groups = {spec["group"] for spec in SERIES.values()}
+        caches = {group: cached(group, maxsize=maxsize)(func) for group in groups}
+
+        @wraps(func)
+        def wrapper(series, *args, **kwargs):
+            return caches[SERIES[series]["group"]](series, *args, **kwargs)
+
+        wrapper.caches = caches
+        return wrapper
+
+    return decorate
+
+
+def _window(years, values, start, end):
+    start = years[0] if start is None else start
+    end = years[-1] if end is None else end
+    window = (years >= start) & (years <= end)
+    return years[window].astype(float), values[:, window]
+
+
+def _sum_of_squares(values, valid, fitted):
+    # Sum over the valid years of every row of the squared residuals
+    return (np.where(valid, values - fitted, 0) ** 2).sum(axis=1)
+
+
+def _total_sum_of_squares(values, valid):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(valid, values, 0).sum(axis=1) / valid.sum(axis=1)
+    return _sum_of_squares(values, valid, mean[:, None])
+
+
+def linear_fit(years, values, min_periods=3):
+    """
+    Least squares line through every row of ``values`` (``rows × years``),
+    ignoring missing values. Returns ``(slope, intercept, r2)`` arrays, NaN
+    for rows with fewer than ``min_periods`` values.
+    """
+    valid = ~np.isnan(values)
+    # Centering the years keeps the sums of squares well conditioned
+    center = years.mean()
+    x = np.where(valid, years - center, 0)
+    y = np.where(valid, values, 0)
+    n = valid.sum(axis=1)
+    sx, sy = x.sum(axis=1), y.sum(axis=1)
+    sxx, sxy = (x * x).sum(axis=1), (x * y).sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+        intercept = (sy - slope * sx) / n - slope * center
+        fitted = intercept[:, None] + slope[:, None] * years
+        r2 = 1 - _sum_of_squares(values, valid, fitted) / _total_sum_of_squares(
+            values, valid
+        )
+
+    too_short = n < min_periods
+    for result in (slope, intercept, r2):
+        result[too_short] = np.nan
+    return slope, intercept, r2
+
+
+def piecewise_fit(years, values, min_segment=5):
+    """
+    Continuous two-segment line through every row of ``values``, with the
+    breakpoint chosen per row among the years leaving ``min_segment`` years
+    on each side. Returns ``(breakpoint, slope_before, slope_after, r2)``.
+
+    Every candidate breakpoint is one batched solve of the 3 × 3 normal
+    equations of all rows, so the loop runs over years, not countries.
+    """
+    valid = ~np.isnan(values)
+    y = np.where(valid, values, 0)
+    total = _total_sum_of_squares(values, valid)
+    rows = len(values)
+    best_sse = np.full(rows, np.inf)
+    best = np.full((rows, 4), np.nan)
+
+    for breakpoint in years[min_segment:-min_segment]:
+        # Basis: 1, x and the hinge max(0, x - breakpoint)
+        basis = np.stack(
+            [np.ones_like(years), years - breakpoint, np.maximum(0, years - breakpoint)]
+        )
+        masked = basis[None, :, :] * valid[:, None, :]
+        gram = np.einsum("rit,jt->rij", masked, basis)
+        moments = np.einsum("rit,rt->ri", masked, y)
+        enough = (valid & (years < breakpoint)).sum(axis=1) >= 2
+        enough &= (valid & (years > breakpoint)).sum(axis=1) >= 2
+        if not enough.any():
+            continue
+
+        coefficients = np.full((rows, 3), np.nan)
+        coefficients[enough] = np.linalg.solve(
+            gram[enough], moments[enough][:, :, None]
+        )[:, :, 0]
+        sse = _sum_of_squares(values, valid, coefficients @ basis)
+        sse = np.where(enough, sse, np.inf)
+
+        better = sse < best_sse
+        best_sse[better] = sse[better]
+        best[better, 0] = breakpoint
+        best[better, 1] = coefficients[better, 1]
+        best[better, 2] = coefficients[better, 1] + coefficients[better, 2]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            best[better, 3] = 1 - sse[better] / total[better]
+
+    return best[:, 0], best[:, 1], best[:, 2], best[:, 3]
+
+
+@_cached_by_series(maxsize=64)
+def linear_trends(series, start=None, end=None):
+    """
+    Linear trend of every entity of one of the SERIES over ``start``–``end``,
+    as a frame with the entity, its slope per year, intercept and R².
+    """
+    names, years, values = SERIES[series]["matrix"]()
+    years, values = _window(years, values, start, end)
+    slope, intercept, r2 = linear_fit(years, values)
+    return pd.DataFrame(
+        {"Entity": names, "Slope": slope, "Intercept": intercept, "R2": r2}
+    ).dropna(subset=["Slope"])
+
+
+@_cached_by_series(maxsize=64)
+def piecewise_trends(series, start=None, end=None, min_segment=5):
+    """
+    Two-segment trend of every entity of one of the SERIES, as a frame with
+    the entity, its breakpoint year, slopes before and after it and R².
+    """
+    names, years, values = SERIES[series]["matrix"]()
+    years, values = _window(years, values, start, end)
+    breakpoint, before, after, r2 = piecewise_fit(years, values, min_segment)
+    return pd.DataFrame(
+        {
+            "Entity": names,
+            "Breakpoint": breakpoint,
+            "Slope before": before,
+            "Slope after": after,
+            "R2": r2,
+        }
+    ).dropna(subset=["Breakpoint"])